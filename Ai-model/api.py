@@ -1,17 +1,56 @@
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse, Response
 from pydantic import BaseModel
-from typing import Optional
-import pandas as pd
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from typing import Literal, Optional
+from datetime import date
+import base64
+import json
+import os
 import re
+import time
+
+from src.dataset_store import DEFAULT_SCORES_FILE_PATH, DatasetStore
+from src.metrics import NULL_TIMER, Counter, Histogram, StageTimer, render_gauge
+from src.recommender_index import DEFAULT_DATA_FILE_PATH, DEFAULT_INDEX_FILE_PATH, EngineUnavailable
+from src.result_cache import ResultCache
+from src.sampling_profiler import SamplingProfiler
+from src.work_pool import BoundedWorkPool, WorkPoolSaturated
 
 app = FastAPI(title="Influencer Recommendation API", version="1.0.0")
 
+# Preprocessed posts served by default (CSV or Parquet)
+DATA_FILE_PATH = os.getenv('RECOMMENDER_DATA_FILE', DEFAULT_DATA_FILE_PATH)
+
+class RecommendationFilters(BaseModel):
+    platforms: Optional[list[str]] = None
+    post_types: Optional[list[str]] = None
+    min_avg_likes: Optional[float] = None
+    max_avg_likes: Optional[float] = None
+    min_avg_comments: Optional[float] = None
+    max_avg_comments: Optional[float] = None
+    posted_after: Optional[date] = None
+    posted_before: Optional[date] = None
+
 class RecommendationRequest(BaseModel):
     business_description: str
     top_n: Optional[int] = 5
-    data_file_path: Optional[str] = 'data/combined_preprocessed_influencer_data.csv'
+    data_file_path: Optional[str] = DATA_FILE_PATH
+    filters: Optional[RecommendationFilters] = None
+    engine: Literal["sparse", "lsa"] = "sparse"
+    timings: bool = False
+    # Return the top_n ranking in pages of this size; the rest is fetched from /recommend/page
+    page_size: Optional[int] = None
+
+class BatchRecommendationRequest(BaseModel):
+    business_descriptions: list[str]
+    top_n: Optional[int] = 5
+    data_file_path: Optional[str] = DATA_FILE_PATH
+    filters: Optional[RecommendationFilters] = None
+    engine: Literal["sparse", "lsa"] = "sparse"
+    timings: bool = False
+
+class IngestRequest(BaseModel):
+    delta_file_path: str
 
 class InfluencerRecommendation(BaseModel):
     username: str
@@ -27,16 +66,41 @@ class InfluencerScore(BaseModel):
     post_count: int
     total_comments: int
     avg_comments: float
+    rank: Optional[int] = None
 
 class InfluencerScoreResponse(BaseModel):
     success: bool
     message: str
     influencer_data: Optional[InfluencerScore] = None
 
+class InfluencerScoresRequest(BaseModel):
+    influencer_names: list[str]
+
+class InfluencerScoresResponse(BaseModel):
+    success: bool
+    message: str
+    influencer_data: list[InfluencerScore] = []
+    not_found: list[str] = []
+
+class LeaderboardResponse(BaseModel):
+    success: bool
+    message: str
+    total: int
+    leaderboard: list[InfluencerScore] = []
+
 class RecommendationResponse(BaseModel):
     success: bool
     message: str
     recommendations: Optional[list[InfluencerRecommendation]] = None
+    total: Optional[int] = None
+    next_cursor: Optional[str] = None
+    timings: Optional[dict[str, float]] = None
+
+class BatchRecommendationResponse(BaseModel):
+    success: bool
+    message: str
+    results: list[RecommendationResponse] = []
+    timings: Optional[dict[str, float]] = None
 
 # --- Helper function for text cleaning ---
 def clean_text(text):
@@ -49,90 +113,158 @@ def clean_text(text):
     text = re.sub(r'\s+', ' ', text).strip()
     return text
 
-# --- Recommendation function ---
-def recommend_influencers(user_business_description, data_file_path='data/combined_preprocessed_influencer_data.csv', top_n=5):
+# --- Dataset store ---
+# The recommendation index and the score table are built once and kept in memory as an immutable
+# snapshot. A background watcher rebuilds them when the data files change and swaps the new
+# snapshot in atomically; requests keep using the snapshot they started with.
+dataset_store = DatasetStore(
+    data_file_path=DATA_FILE_PATH,
+    scores_file_path=DEFAULT_SCORES_FILE_PATH,
+    index_file_path=DEFAULT_INDEX_FILE_PATH,
+    poll_interval=float(os.getenv('RECOMMENDER_RELOAD_INTERVAL', '30')),
+    # Dimensions of the optional 'lsa' engine; 0 serves only the sparse engine
+    lsa_components=int(os.getenv('RECOMMENDER_LSA_COMPONENTS', '0')),
+    lsa_quantize=os.getenv('RECOMMENDER_LSA_INT8', '').lower() in ('1', 'true', 'yes'),
+    # Score the default dataset in this many worker processes (0 scores on the work pool threads)
+    shards=int(os.getenv('RECOMMENDER_SHARDS', '0')),
+    shard_dir=os.getenv('RECOMMENDER_SHARD_DIR') or None,
+    # Indexes kept for requests naming another data_file_path
+    extra_indexes=int(os.getenv('RECOMMENDER_EXTRA_INDEXES', '4')),
+)
+
+# --- Work pool ---
+# Scoring is CPU-bound, so it runs on a bounded thread pool instead of the event loop. When all
+# workers are busy and the queue is full, new requests get a 503 instead of waiting.
+work_pool = BoundedWorkPool(
+    max_workers=int(os.getenv('RECOMMENDER_MAX_WORKERS', str(min(4, os.cpu_count() or 1)))),
+    max_queue=int(os.getenv('RECOMMENDER_MAX_QUEUE', '32')),
+)
+
+async def run_in_work_pool(fn, *args, **kwargs):
     try:
-        # Load the preprocessed data
-        df = pd.read_csv(data_file_path)
-
-        # Ensure 'cleaned_caption' and 'cleaned_hashtags' columns exist and are string type
-        for col in ['cleaned_caption', 'cleaned_hashtags']:
-            if col not in df.columns:
-                raise ValueError(f"Required column '{col}' not found in the preprocessed data.")
-            df[col] = df[col].astype(str).fillna("")
-
-        # Combine relevant text columns for each post.
-        df['combined_post_text'] = df['cleaned_caption'] + " " + df['cleaned_hashtags']
-
-        # Group by username to get a single, comprehensive text representation for each influencer.
-        influencer_content = df.groupby('username')['combined_post_text'].apply(lambda x: " ".join(x)).reset_index()
-        influencer_content.rename(columns={'combined_post_text': 'influencer_profile_text'}, inplace=True)
-
-        # Calculate average likes and comments for each influencer (engagement metrics)
-        influencer_engagement = df.groupby('username')[['likes', 'comments']].mean().reset_index()
-        influencer_engagement.rename(columns={'likes': 'avg_likes', 'comments': 'avg_comments'}, inplace=True)
-
-        # Merge content and engagement data into a single DataFrame for influencers
-        influencers_df = pd.merge(influencer_content, influencer_engagement, on='username', how='left')
-
-        # --- IMPROVED TF-IDF Vectorization ---
-        # Use better parameters for more meaningful similarity scores
-        tfidf_vectorizer = TfidfVectorizer(
-            stop_words='english',
-            max_features=10000,  # Increased vocabulary
-            min_df=1,            # Include words that appear at least once
-            max_df=0.95,         # Exclude very common words
-            ngram_range=(1, 2),  # Include unigrams and bigrams
-            sublinear_tf=True    # Apply sublinear tf scaling
-        )
-
-        # Clean and expand user business description for better matching
-        expanded_description = expand_business_description(user_business_description)
+        return await work_pool.run(fn, *args, **kwargs)
+    except WorkPoolSaturated as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+
+# --- Result cache ---
+# Rankings for repeated descriptions are served from an LRU/TTL cache. Keys include the index's
+# source signature, and the cache is cleared whenever the dataset snapshot is swapped.
+result_cache = ResultCache(
+    max_size=int(os.getenv('RECOMMENDER_CACHE_SIZE', '1024')),
+    ttl_seconds=float(os.getenv('RECOMMENDER_CACHE_TTL', '300')),
+)
+dataset_store.add_reload_listener(lambda snapshot: result_cache.clear())
+
+# --- Metrics ---
+# Exposed in Prometheus text format on /metrics. Stage timings come from a StageTimer that every
+# recommendation request carries through the dataset lookup, cache, index and serialization.
+REQUEST_LATENCY = Histogram('recommender_request_duration_seconds', "HTTP request latency", ['endpoint'])
+REQUESTS = Counter('recommender_requests_total', "HTTP requests by endpoint and status code", ['endpoint', 'status'])
+ERRORS = Counter('recommender_errors_total', "HTTP requests that ended with a 5xx status", ['endpoint'])
+STAGE_LATENCY = Histogram('recommender_stage_duration_seconds', "Time spent in each recommendation stage",
+                          ['endpoint', 'stage'])
+
+# Profiles a sample of recommendation requests (e.g. RECOMMENDER_PROFILE_SAMPLE_RATE=0.01) and keeps
+# the ones slower than RECOMMENDER_PROFILE_MIN_MS as .prof files
+profiler = SamplingProfiler(
+    sample_rate=float(os.getenv('RECOMMENDER_PROFILE_SAMPLE_RATE', '0')),
+    output_dir=os.getenv('RECOMMENDER_PROFILE_DIR', 'profiles'),
+    min_duration_ms=float(os.getenv('RECOMMENDER_PROFILE_MIN_MS', '0')),
+)
+
+def endpoint_label(request):
+    """
+    Route path of the request, so unknown paths do not each create a new metrics series.
+    """
+    path = request.url.path
+    return path if any(route.path == path for route in app.routes) else "unmatched"
 
-        # Fit the vectorizer on all influencer profile texts and the expanded user description
-        all_texts_for_tfidf = influencers_df['influencer_profile_text'].tolist() + [expanded_description]
-        tfidf_vectorizer.fit(all_texts_for_tfidf)
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    start = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        endpoint = endpoint_label(request)
+        REQUEST_LATENCY.observe(time.perf_counter() - start, endpoint=endpoint)
+        REQUESTS.inc(endpoint=endpoint, status=str(status_code))
+        if status_code >= 500:
+            ERRORS.inc(endpoint=endpoint)
+
+def recommendation_cache_key(index, data_file_path, expanded_description, top_n, filters=None, engine='sparse'):
+    normalized_description = ' '.join(expanded_description.split())
+    filters_key = tuple(
+        (name, tuple(value) if isinstance(value, list) else value) for name, value in sorted((filters or {}).items())
+    )
+    return data_file_path, index.source_signature, normalized_description, top_n, filters_key, engine
+
+def filter_arguments(filters):
+    """
+    RecommendationFilters as keyword arguments for RecommenderIndex.filter_mask(), unset filters left out.
+    """
+    return filters.model_dump(exclude_none=True) if filters is not None else {}
 
-        # Transform the influencer profile texts and the user's business description into TF-IDF vectors.
-        influencer_tfidf_matrix = tfidf_vectorizer.transform(influencers_df['influencer_profile_text'])
-        user_tfidf_vector = tfidf_vectorizer.transform([expanded_description])
+# --- Recommendation function ---
+def recommend_influencers(user_business_description, data_file_path=DATA_FILE_PATH, top_n=5, filters=None,
+                          engine='sparse', index=None, timer=NULL_TIMER):
+    try:
+        if index is None:
+            with timer.stage('dataset'):
+                index = dataset_store.recommender_for(data_file_path)
 
-        # --- Enhanced Cosine Similarity Calculation ---
-        cosine_similarities = cosine_similarity(user_tfidf_vector, influencer_tfidf_matrix).flatten()
+        # Clean and expand user business description for better matching
+        with timer.stage('expand'):
+            expanded_description = expand_business_description(user_business_description)
 
-        # Normalize similarity scores to 0-1 range for better interpretation
-        if cosine_similarities.max() > 0:
-            normalized_similarities = (cosine_similarities - cosine_similarities.min()) / (cosine_similarities.max() - cosine_similarities.min())
-        else:
-            normalized_similarities = cosine_similarities
+        with timer.stage('cache'):
+            cache_key = recommendation_cache_key(index, data_file_path, expanded_description, top_n, filters, engine)
+            recommended_df = result_cache.get(cache_key)
+        if recommended_df is None:
+            # Return with original similarity score but sorted by final_score
+            recommended_df = index.recommend(expanded_description, top_n=top_n, filters=filters, engine=engine,
+                                             timer=timer)
+            result_cache.put(cache_key, recommended_df)
 
-        influencers_df['similarity_score'] = cosine_similarities
-        influencers_df['normalized_similarity'] = normalized_similarities
+        return recommended_df
 
-        # Add engagement weight to improve recommendations
-        # Normalize engagement metrics
-        if influencers_df['avg_likes'].max() > 0:
-            influencers_df['engagement_score'] = (
-                0.7 * (influencers_df['avg_likes'] / influencers_df['avg_likes'].max()) +
-                0.3 * (influencers_df['avg_comments'] / influencers_df['avg_comments'].max())
-            )
-        else:
-            influencers_df['engagement_score'] = 0
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Data file '{data_file_path}' not found.")
+    except EngineUnavailable as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An error occurred during recommendation: {str(e)}")
 
-        # Combined score: 70% similarity + 30% engagement
-        influencers_df['final_score'] = (
-            0.7 * influencers_df['normalized_similarity'] +
-            0.3 * influencers_df['engagement_score']
-        )
+def recommend_influencers_batch(user_business_descriptions, data_file_path=DATA_FILE_PATH, top_n=5, filters=None,
+                                engine='sparse', timer=NULL_TIMER):
+    try:
+        with timer.stage('dataset'):
+            index = dataset_store.recommender_for(data_file_path)
+        with timer.stage('expand'):
+            expanded_descriptions = [expand_business_description(d) for d in user_business_descriptions]
+        with timer.stage('cache'):
+            cache_keys = [
+                recommendation_cache_key(index, data_file_path, d, top_n, filters, engine) for d in expanded_descriptions
+            ]
+            results = [result_cache.get(key) for key in cache_keys]
 
-        # --- Recommendation ---
-        recommended_influencers = influencers_df.sort_values(by='final_score', ascending=False)
+        # Score only the descriptions that were not cached, still in a single batch
+        misses = [i for i, result in enumerate(results) if result is None]
+        if misses:
+            scored = index.recommend_many([expanded_descriptions[i] for i in misses], top_n=top_n,
+                                          filters=filters, engine=engine, timer=timer)
+            for i, recommended_df in zip(misses, scored):
+                results[i] = recommended_df
+                result_cache.put(cache_keys[i], recommended_df)
 
-        # Return with original similarity score but sorted by final_score
-        return recommended_influencers.head(top_n)
+        return results
 
     except FileNotFoundError:
         raise HTTPException(status_code=404, detail=f"Data file '{data_file_path}' not found.")
+    except EngineUnavailable as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred during recommendation: {str(e)}")
 
@@ -167,44 +299,223 @@ def expand_business_description(description):
 
     return ' '.join(expanded_terms)
 
+# --- Serialization ---
+# Responses are encoded straight from the ranking's columns instead of through one pydantic model
+# per row, with orjson (a requirement). The json module is only a fallback for installs without it.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+RECOMMENDATION_FIELDS = ['username', 'similarity_score', 'avg_likes', 'avg_comments']
+
+def recommendation_records(recommended_df):
+    """
+    Ranked rows as InfluencerRecommendation dicts, built from whole columns.
+    """
+    if recommended_df is None or recommended_df.empty:
+        return []
+    columns = [recommended_df['username'].astype(str).tolist()] + [
+        recommended_df[col].to_numpy(dtype=float).tolist() for col in RECOMMENDATION_FIELDS[1:]
+    ]
+    return [dict(zip(RECOMMENDATION_FIELDS, values)) for values in zip(*columns)]
+
+def build_recommendation_response(recommended_df):
+    """
+    RecommendationResponse content for a ranking, as a plain dict for json_response().
+    """
+    recommendations = recommendation_records(recommended_df)
+    return {
+        "success": True,
+        "message": (f"Found {len(recommendations)} recommendations" if recommendations
+                    else "No recommendations found for the given description"),
+        "recommendations": recommendations,
+    }
+
+def json_response(content, status_code=200):
+    if orjson is not None:
+        body = orjson.dumps(content)
+    else:
+        body = json.dumps(content, separators=(',', ':')).encode()
+    return Response(body, status_code=status_code, media_type="application/json")
+
+# --- Pagination ---
+# Cursors carry everything needed to rebuild the ranking: the request, the dataset it was ranked
+# on and the next offset. Any worker can serve the next page, from its result cache or by scoring
+# again. A cursor stops working (410) once the dataset it was ranked on has been replaced.
+PAGINATED_FIELDS = ['business_description', 'top_n', 'data_file_path', 'engine']
+
+def encode_cursor(request, dataset_signature, offset, page_size):
+    state = {name: getattr(request, name) for name in PAGINATED_FIELDS}
+    state.update(
+        filters=request.filters.model_dump(mode='json', exclude_none=True) if request.filters is not None else None,
+        dataset=list(dataset_signature) if dataset_signature else None,
+        offset=offset,
+        page_size=page_size,
+    )
+    return base64.urlsafe_b64encode(json.dumps(state, separators=(',', ':')).encode()).decode()
+
+def parse_cursor(cursor):
+    """
+    Returns (RecommendationRequest, dataset signature, offset, page size) for a next_cursor.
+    """
+    try:
+        state = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        request = RecommendationRequest(**{name: state[name] for name in PAGINATED_FIELDS + ['filters']})
+        offset, page_size = int(state['offset']), int(state['page_size'])
+    except Exception:
+        raise HTTPException(status_code=400, detail="Malformed cursor.")
+    if offset < 0 or page_size < 1:
+        raise HTTPException(status_code=400, detail="Malformed cursor.")
+    return request, state['dataset'], offset, page_size
+
+def paginated_recommendations(request, offset, page_size, dataset_signature=None, timer=NULL_TIMER):
+    """
+    Ranks request on the current index and returns the page of page_size starting at offset as a
+    RecommendationResponse dict with total and next_cursor. With dataset_signature, the index must
+    still be the one that signature was taken from, otherwise the cursor is stale (410).
+    """
+    with timer.stage('dataset'):
+        try:
+            index = dataset_store.recommender_for(request.data_file_path)
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail=f"Data file '{request.data_file_path}' not found.")
+    signature = list(index.source_signature) if index.source_signature else None
+    if dataset_signature is not None and signature != dataset_signature:
+        raise HTTPException(status_code=410, detail="The dataset changed since the first page. Request the recommendations again.")
+
+    recommended_df = recommend_influencers(
+        request.business_description, data_file_path=request.data_file_path, top_n=request.top_n,
+        filters=filter_arguments(request.filters), engine=request.engine, index=index, timer=timer
+    )
+    with timer.stage('serialize'):
+        end = offset + page_size
+        response = build_recommendation_response(recommended_df.iloc[offset:end])
+        response["total"] = len(recommended_df)
+        if end < len(recommended_df):
+            response["next_cursor"] = encode_cursor(request, signature, end, page_size)
+    return response
+
+@app.on_event("startup")
+def load_dataset():
+    # Build (or load the prebuilt) index and score table before the first request arrives
+    dataset_store.reload()
+    snapshot = dataset_store.snapshot
+    if snapshot.recommender is None:
+        print(f"Warning: Data file '{DATA_FILE_PATH}' not found. It will be picked up once it exists.")
+    if snapshot.scores is None:
+        print(f"Warning: Scores file '{DEFAULT_SCORES_FILE_PATH}' not found. It will be picked up once it exists.")
+    dataset_store.start_watching()
+
+@app.on_event("shutdown")
+def stop_dataset_watcher():
+    dataset_store.close()
+    work_pool.shutdown(wait=False)
+
 @app.get("/")
 async def root():
     return {"message": "Influencer Recommendation API", "version": "1.0.0"}
 
-@app.post("/recommend", response_model=RecommendationResponse)
+def timed_in_work_pool(stage_timer, profile_name, fn, /, **kwargs):
+    """
+    Runs fn(**kwargs) on the work pool, recording how long it waited for a worker as the 'queue'
+    stage of stage_timer and passing it through the sampling profiler.
+    """
+    submitted_at = time.perf_counter()
+
+    def job():
+        stage_timer.add('queue', time.perf_counter() - submitted_at)
+        return profiler.run(profile_name, fn, **kwargs)
+
+    return run_in_work_pool(job)
+
+@app.post("/recommend", response_model=RecommendationResponse, response_model_exclude_none=True)
 async def get_recommendations(request: RecommendationRequest):
     """
     Get influencer recommendations based on business description
     """
+    if request.page_size is not None and request.page_size < 1:
+        raise HTTPException(status_code=400, detail="page_size must be at least 1.")
     try:
-        recommended_df = recommend_influencers(
-            user_business_description=request.business_description,
+        timer = StageTimer()
+        if request.page_size is not None:
+            response = await timed_in_work_pool(
+                timer, 'recommend', paginated_recommendations,
+                request=request, offset=0, page_size=request.page_size, timer=timer
+            )
+        else:
+            recommended_df = await timed_in_work_pool(
+                timer, 'recommend', recommend_influencers,
+                user_business_description=request.business_description,
+                data_file_path=request.data_file_path,
+                top_n=request.top_n,
+                filters=filter_arguments(request.filters),
+                engine=request.engine,
+                timer=timer
+            )
+            with timer.stage('serialize'):
+                response = build_recommendation_response(recommended_df)
+        timer.observe(STAGE_LATENCY, endpoint="/recommend")
+        if request.timings:
+            response["timings"] = timer.timings_ms()
+        return json_response(response)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
+
+@app.post("/recommend/batch", response_model=BatchRecommendationResponse, response_model_exclude_none=True)
+async def get_batch_recommendations(request: BatchRecommendationRequest):
+    """
+    Get influencer recommendations for many business descriptions in one call
+    """
+    def recommend_and_serialize(timer):
+        recommended_dfs = recommend_influencers_batch(
+            user_business_descriptions=request.business_descriptions,
             data_file_path=request.data_file_path,
-            top_n=request.top_n
+            top_n=request.top_n,
+            filters=filter_arguments(request.filters),
+            engine=request.engine,
+            timer=timer
         )
+        # Serializing hundreds of rankings is CPU work too, so it stays on the worker thread
+        with timer.stage('serialize'):
+            return [build_recommendation_response(df) for df in recommended_dfs]
 
-        if recommended_df is not None and not recommended_df.empty:
-            recommendations = [
-                InfluencerRecommendation(
-                    username=row['username'],
-                    similarity_score=float(row['similarity_score']),
-                    avg_likes=float(row['avg_likes']),
-                    avg_comments=float(row['avg_comments'])
-                )
-                for _, row in recommended_df.iterrows()
-            ]
+    try:
+        timer = StageTimer()
+        results = await timed_in_work_pool(timer, 'recommend_batch', recommend_and_serialize, timer=timer)
+        timer.observe(STAGE_LATENCY, endpoint="/recommend/batch")
+
+        response = {
+            "success": True,
+            "message": f"Scored {len(results)} business descriptions",
+            "results": results,
+        }
+        if request.timings:
+            response["timings"] = timer.timings_ms()
+        return json_response(response)
 
-            return RecommendationResponse(
-                success=True,
-                message=f"Found {len(recommendations)} recommendations",
-                recommendations=recommendations
-            )
-        else:
-            return RecommendationResponse(
-                success=True,
-                message="No recommendations found for the given description",
-                recommendations=[]
-            )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
+
+@app.get("/recommend/page", response_model=RecommendationResponse, response_model_exclude_none=True)
+async def get_recommendations_page(
+    cursor: str = Query(..., description="next_cursor of the previous page"),
+    limit: Optional[int] = Query(None, ge=1, description="Page size; defaults to the cursor's page size"),
+):
+    """
+    Get the next page of a paginated ranking; it is scored again unless still in the result cache
+    """
+    request, dataset_signature, offset, page_size = parse_cursor(cursor)
+    try:
+        response = await run_in_work_pool(
+            paginated_recommendations, request, offset, limit or page_size, dataset_signature=dataset_signature
+        )
+        return json_response(response)
 
     except HTTPException:
         raise
@@ -221,40 +532,162 @@ async def get_score_by_influencer_score(influencer_name: str = Query(..., descri
     Get score and statistics for a specific influencer by username
     """
     try:
-        # Load the influencer scores CSV file
-        df = pd.read_csv('data/influencer_scores.csv')
+        # Use the score table of the current dataset snapshot
+        score_table = dataset_store.snapshot.scores
+        if score_table is None:
+            raise FileNotFoundError(DEFAULT_SCORES_FILE_PATH)
 
-        # Filter for the specific influencer (case-insensitive search)
-        influencer_data = df[df['username'].str.lower() == influencer_name.lower()]
+        # Case-insensitive lookup
+        record = score_table.get(influencer_name)
 
-        if influencer_data.empty:
+        if record is None:
             return InfluencerScoreResponse(
                 success=False,
                 message=f"Influencer '{influencer_name}' not found in the dataset",
                 influencer_data=None
             )
 
-        # Extract the data for the influencer
-        row = influencer_data.iloc[0]
-
-        # Create the influencer score object
-        influencer_score = InfluencerScore(
-            username=row['username'],
-            score=float(row['score']),
-            avg_likes=float(row['avg_likes']),
-            total_likes=int(row['total_likes']),
-            post_count=int(row['post_count']),
-            total_comments=int(row['total_comments']),
-            avg_comments=float(row['avg_comments'])
+        return InfluencerScoreResponse(
+            success=True,
+            message=f"Successfully retrieved data for @{record.username}",
+            influencer_data=InfluencerScore(**record._asdict(), rank=score_table.rank(record.username))
         )
 
-        return InfluencerScoreResponse(
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Influencer scores data file not found. Please ensure the data has been processed.")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An error occurred while retrieving influencer data: {str(e)}")
+
+@app.post("/getScoresByInfluencers", response_model=InfluencerScoresResponse)
+async def get_scores_by_influencers(request: InfluencerScoresRequest):
+    """
+    Get scores and statistics for many influencers in one call
+    """
+    try:
+        score_table = dataset_store.snapshot.scores
+        if score_table is None:
+            raise FileNotFoundError(DEFAULT_SCORES_FILE_PATH)
+
+        influencer_data = []
+        not_found = []
+        for influencer_name, record in zip(request.influencer_names, score_table.get_many(request.influencer_names)):
+            if record is None:
+                not_found.append(influencer_name)
+            else:
+                influencer_data.append(InfluencerScore(**record._asdict(), rank=score_table.rank(record.username)))
+
+        return InfluencerScoresResponse(
             success=True,
-            message=f"Successfully retrieved data for @{row['username']}",
-            influencer_data=influencer_score
+            message=f"Found {len(influencer_data)} of {len(request.influencer_names)} influencers",
+            influencer_data=influencer_data,
+            not_found=not_found
         )
 
     except FileNotFoundError:
         raise HTTPException(status_code=404, detail="Influencer scores data file not found. Please ensure the data has been processed.")
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"An error occurred while retrieving influencer data: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"An error occurred while retrieving influencer data: {str(e)}")
+
+@app.get("/leaderboard", response_model=LeaderboardResponse)
+async def get_leaderboard(
+    top: int = Query(10, ge=1, le=1000, description="Number of influencers to return"),
+    offset: int = Query(0, ge=0, description="Number of higher-ranked influencers to skip"),
+):
+    """
+    Get influencers ranked by score, best first
+    """
+    score_table = dataset_store.snapshot.scores
+    if score_table is None:
+        raise HTTPException(status_code=404, detail="Influencer scores data file not found. Please ensure the data has been processed.")
+
+    records = score_table.leaderboard(top=top, offset=offset)
+    return LeaderboardResponse(
+        success=True,
+        message=f"Ranks {offset + 1}-{offset + len(records)} of {len(score_table)}" if records else "No influencers at this offset",
+        total=len(score_table),
+        leaderboard=[InfluencerScore(**record._asdict(), rank=offset + i) for i, record in enumerate(records, start=1)]
+    )
+
+@app.get("/stats")
+async def get_stats():
+    """
+    Get result cache, work pool and dataset statistics
+    """
+    snapshot = dataset_store.snapshot
+    return {
+        "dataset_version": snapshot.version if snapshot is not None else None,
+        "cache": result_cache.stats(),
+        "work_pool": work_pool.stats(),
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    Request, stage latency, dataset, cache and work pool metrics in Prometheus text format
+    """
+    lines = []
+    for metric in [REQUESTS, ERRORS, REQUEST_LATENCY, STAGE_LATENCY]:
+        lines.extend(metric.render())
+
+    snapshot = dataset_store.snapshot
+    if snapshot is not None:
+        influencer_count = len(snapshot.recommender) if snapshot.recommender is not None else 0
+        lines.extend(render_gauge('recommender_dataset_influencers', "Influencers in the served index",
+                                  influencer_count))
+        lines.extend(render_gauge('recommender_dataset_info', "Version of the served dataset snapshot", 1,
+                                  {"version": snapshot.version}))
+        lines.extend(render_gauge('recommender_dataset_loaded_timestamp_seconds',
+                                  "When the served dataset snapshot was installed", snapshot.loaded_at))
+
+    cache_stats = result_cache.stats()
+    for name in ["size", "hits", "misses", "evictions", "expirations"]:
+        lines.extend(render_gauge(f'recommender_cache_{name}', f"Result cache {name}", cache_stats[name]))
+    pool_stats = work_pool.stats()
+    for name in ["in_flight", "rejected"]:
+        lines.extend(render_gauge(f'recommender_work_pool_{name}', f"Work pool jobs {name.replace('_', ' ')}",
+                                  pool_stats[name]))
+    lines.extend(render_gauge('recommender_profiles_written', "Sampled request profiles written",
+                              profiler.profiles_written))
+
+    return PlainTextResponse("\n".join(lines) + "\n", media_type="text/plain; version=0.0.4")
+
+@app.post("/admin/ingest")
+async def ingest_delta(request: IngestRequest):
+    """
+    Append a delta file of new posts and refresh only the affected influencers
+    """
+    try:
+        stats = await run_in_work_pool(dataset_store.ingest, request.delta_file_path)
+        return {
+            "success": True,
+            "message": f"Added {stats['posts_added']} new posts, skipped {stats['duplicates_skipped']} already seen",
+            "stats": {key: value for key, value in stats.items() if key != 'post_keys_digest'},
+            "version": dataset_store.snapshot.version,
+        }
+    except HTTPException:
+        raise
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Delta file '{request.delta_file_path}' not found.")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An error occurred during ingestion: {str(e)}")
+
+@app.get("/admin/dataset")
+async def get_dataset_status():
+    """
+    Get the version of the dataset snapshot currently being served
+    """
+    snapshot = dataset_store.snapshot
+    return {
+        "version": snapshot.version,
+        "loaded_at": snapshot.loaded_at,
+        "influencer_count": len(snapshot.recommender) if snapshot.recommender is not None else 0,
+        "reload_pending": dataset_store.has_changes(),
+    }
+
+@app.post("/admin/reload")
+async def reload_dataset(force: bool = Query(False, description="Rebuild even if the data files did not change")):
+    """
+    Rebuild the in-memory dataset in the background and swap it in when ready
+    """
+    dataset_store.reload_in_background(force=force)
+    return {"success": True, "message": "Dataset reload started", "version": dataset_store.snapshot.version}
@@ -0,0 +1,203 @@
+# benchmarks/bench_recommender.py
+#
+# Recommendation latency benchmark. Run from Ai-model/:
+#
+#   python -m benchmarks.bench_recommender --sizes 10000x200 100000x2000 --output bench.json
+#
+# Each size is POSTSxINFLUENCERS. Results are written as JSON so runs can be compared across releases.
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from benchmarks.synthetic_data import generate_descriptions, write_synthetic_dataset
+from src.data_processor import preprocess_and_combine_data_streaming
+from src.recommender_index import RecommenderIndex
+from src.sharded_scoring import ShardedRecommender
+
+# The ASGI stage goes through api.py, which reads its configuration from the environment at import
+os.environ.setdefault('RECOMMENDER_RELOAD_INTERVAL', '0')
+os.environ.setdefault('RECOMMENDER_CACHE_SIZE', '0')
+
+
+def latency_summary(samples):
+    samples_ms = np.asarray(samples) * 1000
+    return {
+        'count': len(samples_ms),
+        'mean_ms': float(samples_ms.mean()),
+        'p50_ms': float(np.percentile(samples_ms, 50)),
+        'p95_ms': float(np.percentile(samples_ms, 95)),
+        'p99_ms': float(np.percentile(samples_ms, 99)),
+        'max_ms': float(samples_ms.max()),
+    }
+
+
+def measure(fn, trace_memory=True):
+    """
+    Runs fn() for wall time, then again under tracemalloc for its peak Python/NumPy allocations.
+    The runs are separate because tracing slows the measured code down several times over.
+    Returns (first result, measurements).
+    """
+    start = time.perf_counter()
+    result = fn()
+    measurements = {'seconds': time.perf_counter() - start}
+    if trace_memory:
+        tracemalloc.start()
+        fn()
+        measurements['peak_memory_mb'] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        tracemalloc.stop()
+    return result, measurements
+
+
+def bench_preprocessing(work_dir, n_posts, n_influencers, args):
+    raw_path = write_synthetic_dataset(os.path.join(work_dir, 'raw.csv'), n_posts, n_influencers,
+                                       seed=args.seed, raw=True)
+
+    def preprocess():
+        with contextlib.redirect_stdout(io.StringIO()):
+            preprocess_and_combine_data_streaming(raw_path, os.path.join(work_dir, 'preprocessed.csv'))
+
+    _, m = measure(preprocess, trace_memory=not args.skip_memory)
+    return {**m, 'posts_per_second': n_posts / m['seconds']}
+
+
+def bench_index_build(data_path, args):
+    index, m = measure(lambda: RecommenderIndex.from_data_file(data_path), trace_memory=not args.skip_memory)
+    return index, {**m, 'influencers': len(index), 'vocabulary_size': index.tfidf_matrix.shape[1],
+                   'matrix_nnz': int(index.tfidf_matrix.nnz)}
+
+
+def bench_in_process(index, descriptions, args):
+    from api import expand_business_description
+
+    expanded = [expand_business_description(d) for d in descriptions]
+    for description in expanded[:args.warmup]:
+        index.recommend(description, top_n=args.top_n)
+
+    samples = []
+    for description in expanded:
+        start = time.perf_counter()
+        index.recommend(description, top_n=args.top_n)
+        samples.append(time.perf_counter() - start)
+    single = latency_summary(samples)
+    if not args.skip_memory:
+        _, m = measure(lambda: index.recommend(expanded[0], top_n=args.top_n))
+        single['peak_memory_mb'] = m['peak_memory_mb']
+
+    _, batch = measure(lambda: index.recommend_many(expanded, top_n=args.top_n), trace_memory=not args.skip_memory)
+    return {
+        'single': single,
+        'batch': {**batch, 'queries': len(expanded), 'per_query_ms': batch['seconds'] * 1000 / len(expanded)},
+    }
+
+
+def asgi_client():
+    """
+    Test client for api.app, or None when httpx (needed by TestClient, not in requirements.txt) is missing.
+    """
+    try:
+        from fastapi.testclient import TestClient
+    except (ImportError, RuntimeError):
+        return None
+
+    import api
+    return TestClient(api.app)
+
+
+def bench_asgi(client, data_path, descriptions, args):
+    samples = []
+    errors = 0
+    payloads = [{'business_description': d, 'top_n': args.top_n, 'data_file_path': data_path} for d in descriptions]
+    for payload in payloads[:args.warmup]:
+        client.post('/recommend', json=payload)
+    for payload in payloads:
+        start = time.perf_counter()
+        response = client.post('/recommend', json=payload)
+        samples.append(time.perf_counter() - start)
+        errors += response.status_code != 200
+    return {**latency_summary(samples), 'errors': errors}
+
+
+def run_size(n_posts, n_influencers, args, client):
+    with tempfile.TemporaryDirectory() as work_dir:
+        result = {'posts': n_posts, 'influencers': n_influencers}
+        if not args.skip_preprocessing:
+            result['preprocessing'] = bench_preprocessing(work_dir, n_posts, n_influencers, args)
+
+        data_path = write_synthetic_dataset(os.path.join(work_dir, f"posts.{args.format}"),
+                                            n_posts, n_influencers, seed=args.seed)
+        index, result['index_build'] = bench_index_build(data_path, args)
+
+        descriptions = generate_descriptions(args.queries, seed=args.seed)
+        result['query_in_process'] = bench_in_process(index, descriptions, args)
+        if args.shards:
+            sharded = ShardedRecommender(index, args.shards, work_dir=work_dir)
+            try:
+                result['query_sharded'] = {'shards': sharded.n_shards,
+                                           **bench_in_process(sharded, descriptions, args)}
+            finally:
+                sharded.close()
+        if client is not None:
+            result['query_asgi'] = bench_asgi(client, data_path, descriptions, args)
+        elif not args.skip_asgi:
+            result['query_asgi'] = {'skipped': "fastapi.testclient needs httpx"}
+        return result
+
+
+def parse_size(value):
+    n_posts, _, n_influencers = value.lower().partition('x')
+    return int(n_posts), int(n_influencers)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark recommendation latency on synthetic datasets.")
+    parser.add_argument('--sizes', nargs='+', type=parse_size, default=[(10_000, 200)],
+                        help="POSTSxINFLUENCERS, e.g. 1000x20 100000x2000 1000000x100000")
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument('--top-n', type=int, default=5)
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--skip-preprocessing', action='store_true')
+    parser.add_argument('--skip-asgi', action='store_true')
+    parser.add_argument('--skip-memory', action='store_true', help="Skip the tracemalloc passes")
+    parser.add_argument('--shards', type=int, default=0,
+                        help="Also time queries scored by this many shard processes")
+    parser.add_argument('--output', help="Write the JSON results to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    results = {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'config': {key: value for key, value in vars(args).items() if key != 'output'},
+        'runs': [],
+    }
+    client = None if args.skip_asgi else asgi_client()
+    with client if client is not None else contextlib.nullcontext():
+        for n_posts, n_influencers in args.sizes:
+            print(f"Benchmarking {n_posts} posts / {n_influencers} influencers...", file=sys.stderr)
+            results['runs'].append(run_size(n_posts, n_influencers, args, client))
+    results['max_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+# benchmarks/compare_engines.py
+#
+# Memory / latency / recall comparison of the sparse and LSA scoring engines. Run from Ai-model/:
+#
+#   python -m benchmarks.compare_engines --posts 100000 --influencers 10000 --components 64 128
+#
+# Recall@k is the overlap of an LSA engine's top_k with the sparse engine's top_k for the same query.
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_recommender import latency_summary
+from benchmarks.synthetic_data import generate_descriptions, write_synthetic_dataset
+from src.recommender_index import RecommenderIndex
+
+
+def sparse_nbytes(index):
+    return sum(part.nbytes for matrix in [index.tfidf_matrix, index.postings]
+               for part in [matrix.data, matrix.indices, matrix.indptr])
+
+
+def time_queries(index, expanded, top_n, engine):
+    samples = []
+    results = []
+    for description in expanded:
+        start = time.perf_counter()
+        results.append(index.recommend(description, top_n=top_n, engine=engine))
+        samples.append(time.perf_counter() - start)
+    return [list(df['username']) for df in results], latency_summary(samples)
+
+
+def compare_engines(n_posts, n_influencers, components, n_queries=200, top_n=10, seed=0):
+    from api import expand_business_description
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        data_path = write_synthetic_dataset(os.path.join(work_dir, 'posts.csv'), n_posts, n_influencers, seed=seed)
+        index = RecommenderIndex.from_data_file(data_path)
+
+    expanded = [expand_business_description(d) for d in generate_descriptions(n_queries, seed=seed)]
+    sparse_top, sparse_latency = time_queries(index, expanded, top_n, 'sparse')
+    engines = {'sparse': {'memory_mb': sparse_nbytes(index) / 2 ** 20, 'latency': sparse_latency}}
+
+    for n_components in components:
+        for quantize in [False, True]:
+            start = time.perf_counter()
+            lsa_index = index.with_lsa(n_components=n_components, quantize=quantize)
+            fit_seconds = time.perf_counter() - start
+
+            lsa_top, lsa_latency = time_queries(lsa_index, expanded, top_n, 'lsa')
+            recall = sum(len(set(a) & set(b)) for a, b in zip(sparse_top, lsa_top)) / (top_n * len(expanded))
+            engines[f"lsa{n_components}{'-int8' if quantize else ''}"] = {
+                'memory_mb': lsa_index.lsa.nbytes / 2 ** 20,
+                'fit_seconds': fit_seconds,
+                'latency': lsa_latency,
+                f"recall_at_{top_n}": recall,
+            }
+    return {'posts': n_posts, 'influencers': n_influencers, 'engines': engines}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the sparse and LSA scoring engines.")
+    parser.add_argument('--posts', type=int, default=50_000)
+    parser.add_argument('--influencers', type=int, default=5_000)
+    parser.add_argument('--components', type=int, nargs='+', default=[64, 128])
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--top-n', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    print(f"Comparing engines on {args.posts} posts / {args.influencers} influencers...", file=sys.stderr)
+    result = compare_engines(args.posts, args.influencers, args.components, n_queries=args.queries,
+                             top_n=args.top_n, seed=args.seed)
+    print(json.dumps(result, indent=2))
+    return result
+
+
+if __name__ == '__main__':
+    main()
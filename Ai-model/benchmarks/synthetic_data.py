@@ -0,0 +1,110 @@
+# benchmarks/synthetic_data.py
+
+import numpy as np
+import pandas as pd
+
+from src.data_processor import PostsFileWriter, REQUIRED_COLUMNS
+
+# Topic words mirror the keys and related terms of expand_business_description(), so generated
+# business descriptions actually match some influencers.
+TOPIC_WORDS = {
+    'fashion': ['fashion', 'style', 'clothing', 'apparel', 'outfit', 'wear', 'design', 'trend', 'clothes'],
+    'sustainable': ['sustainable', 'eco', 'green', 'organic', 'natural', 'environment', 'ethical'],
+    'beauty': ['beauty', 'makeup', 'cosmetics', 'skincare', 'glow', 'skin', 'treatment'],
+    'food': ['food', 'restaurant', 'cuisine', 'meal', 'cooking', 'recipe', 'dining', 'taste'],
+    'fitness': ['fitness', 'workout', 'exercise', 'gym', 'health', 'training', 'sport', 'active'],
+    'tech': ['tech', 'technology', 'app', 'digital', 'software', 'innovation', 'gadget'],
+    'travel': ['travel', 'tourism', 'vacation', 'trip', 'destination', 'journey', 'adventure'],
+    'lifestyle': ['lifestyle', 'living', 'daily', 'routine', 'life', 'personal', 'home', 'family'],
+}
+DESCRIPTION_MODIFIERS = ['brand', 'startup', 'shop', 'for young women', 'luxury', 'premium', 'local', 'online']
+
+PLATFORMS = ['Instagram', 'TikTok', 'YouTube', 'Facebook']
+POST_TYPES = ['Image', 'Video', 'Reel', 'Carousel']
+
+# Rows generated and written per chunk, to keep large datasets out of memory
+GENERATION_CHUNK_SIZE = 100_000
+
+
+def _filler_vocabulary(size, rng):
+    letters = np.array(list('abcdefghijklmnopqrstuvwxyz'))
+    lengths = rng.integers(3, 10, size=size)
+    return [''.join(rng.choice(letters, size=n)) for n in lengths]
+
+
+def generate_posts(n_posts, n_influencers, seed=0, vocabulary_size=20_000, words_per_post=18):
+    """
+    Yields DataFrame chunks of synthetic posts with the schema of combined_preprocessed_influencer_data.csv.
+    Each influencer leans towards one or two topics and has a log-normal engagement level.
+    """
+    rng = np.random.default_rng(seed)
+    filler = np.array(_filler_vocabulary(vocabulary_size, rng))
+    topics = list(TOPIC_WORDS)
+    # (topics x words) table, shorter topic lists repeated to a common width
+    width = max(len(words) for words in TOPIC_WORDS.values())
+    topic_table = np.array([[words[i % len(words)] for i in range(width)] for words in TOPIC_WORDS.values()])
+
+    usernames = np.array([f"influencer_{i:06d}" for i in range(n_influencers)])
+    primary_topic = rng.integers(0, len(topics), size=n_influencers)
+    secondary_topic = rng.integers(0, len(topics), size=n_influencers)
+    base_likes = rng.lognormal(mean=8.5, sigma=1.5, size=n_influencers)
+    platform = rng.integers(0, len(PLATFORMS), size=n_influencers)
+    start = pd.Timestamp('2023-01-01')
+
+    for offset in range(0, n_posts, GENERATION_CHUNK_SIZE):
+        n = min(GENERATION_CHUNK_SIZE, n_posts - offset)
+        author = rng.integers(0, n_influencers, size=n)
+        # Every influencer gets at least one post when there are enough posts to go round
+        if offset == 0 and n_posts >= n_influencers:
+            author[:min(n, n_influencers)] = np.arange(min(n, n_influencers))
+
+        topic = np.where(rng.random(n) < 0.7, primary_topic[author], secondary_topic[author])
+        topic_words = topic_table[topic[:, None], rng.integers(0, width, size=(n, 4))]
+        filler_words = filler[rng.integers(0, vocabulary_size, size=(n, words_per_post))]
+        words = np.concatenate([topic_words, filler_words], axis=1).tolist()
+
+        captions = [' '.join(row) for row in words]
+        hashtags = [f"#{row[0]} #{row[1]} #{row[2]}" for row in words]
+
+        likes = (base_likes[author] * rng.lognormal(0, 0.5, size=n)).astype(np.int64)
+        comments = (likes * rng.uniform(0.002, 0.02, size=n)).astype(np.int64)
+        post_dates = start + pd.to_timedelta(rng.integers(0, 900, size=n), unit='D')
+
+        chunk = pd.DataFrame({
+            'platform': np.array(PLATFORMS)[platform[author]],
+            'username': usernames[author],
+            'post_date': post_dates.strftime('%d/%m/%Y'),
+            'caption_text': captions,
+            'post_type': np.array(POST_TYPES)[rng.integers(0, len(POST_TYPES), size=n)],
+            'likes': likes,
+            'comments': comments,
+            'hashtags': hashtags,
+        })
+        chunk['cleaned_caption'] = chunk['caption_text']
+        chunk['cleaned_hashtags'] = chunk['hashtags'].str.replace('#', '', regex=False)
+        yield chunk
+
+
+def write_synthetic_dataset(output_file_path, n_posts, n_influencers, seed=0, raw=False):
+    """
+    Writes a synthetic dataset (CSV, or Parquet for '.parquet' paths). With raw=True only the raw
+    scrape columns are written, as input for the preprocessing benchmark.
+    """
+    with PostsFileWriter(output_file_path) as writer:
+        for chunk in generate_posts(n_posts, n_influencers, seed=seed):
+            writer.write(chunk[REQUIRED_COLUMNS] if raw else chunk)
+    return output_file_path
+
+
+def generate_descriptions(n, seed=0):
+    """
+    Business descriptions in the style clients send, e.g. 'sustainable fashion brand for young women'.
+    """
+    rng = np.random.default_rng(seed)
+    topics = list(TOPIC_WORDS)
+    descriptions = []
+    for _ in range(n):
+        chosen = rng.choice(topics, size=rng.integers(1, 3), replace=False)
+        modifier = rng.choice(DESCRIPTION_MODIFIERS)
+        descriptions.append(f"{' '.join(chosen)} {modifier}")
+    return descriptions
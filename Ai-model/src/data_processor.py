@@ -1,10 +1,35 @@
 # src/data_processor.py
 
-import pandas as pd
+import itertools
+import multiprocessing
 import re
 from datetime import datetime, timedelta
 import random
 
+import numpy as np
+import pandas as pd
+
+# Precompiled cleaning patterns shared by clean_text() and clean_text_series()
+URL_PATTERN = re.compile(r'http\S+|www\S+|https\S+', flags=re.MULTILINE)
+EMOJI_PATTERN = re.compile(r'[\U0001F600-\U0001F64F\U0001F300-\U0001F5FF\U0001F680-\U0001F6FF\U0001F1E0-\U0001F1FF]+')
+NON_LETTER_PATTERN = re.compile(r'[^a-zA-Z\s]')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+REQUIRED_COLUMNS = ['platform', 'username', 'post_date', 'caption_text', 'post_type', 'likes', 'comments', 'hashtags']
+
+# post_date format of the preprocessed data
+POST_DATE_FORMAT = '%d/%m/%Y'
+
+# Columns that identify a post; used to drop duplicate posts
+POST_KEY_COLUMNS = ['username', 'post_date', 'caption_text']
+
+# Influencer score as stored in influencer_scores.csv: 5% of the influencer's total likes
+SCORE_LIKES_WEIGHT = 0.05
+SCORE_COLUMNS = ['username', 'total_likes', 'post_count', 'avg_likes', 'total_comments', 'avg_comments', 'score']
+
+# Post columns the influencer score table is computed from
+SCORE_POST_COLUMNS = ['username', 'likes', 'comments', 'post_date']
+
 
 def clean_text(text):
     """
@@ -15,25 +40,129 @@ def clean_text(text):
         return ""  # Return empty string for non-string types
 
     # Remove URLs (http, https, www)
-    text = re.sub(r'http\S+|www\S+|https\S+', '', text, flags=re.MULTILINE)
+    text = URL_PATTERN.sub('', text)
 
     # Remove emojis (a basic regex, might need to be expanded for all Unicode emojis)
     # This regex specifically targets common emoji blocks.
-    text = re.sub(r'[\U0001F600-\U0001F64F\U0001F300-\U0001F5FF\U0001F680-\U0001F6FF\U0001F1E0-\U0001F1FF]+', '', text)
+    text = EMOJI_PATTERN.sub('', text)
 
     # Remove special characters, numbers, and punctuation, keep only letters and spaces
     # This might need adjustment if you want to keep specific punctuation like periods or commas.
-    text = re.sub(r'[^a-zA-Z\s]', '', text)
+    text = NON_LETTER_PATTERN.sub('', text)
 
     # Convert to lowercase
     text = text.lower()
 
     # Remove extra spaces and strip leading/trailing spaces
-    text = re.sub(r'\s+', ' ', text).strip()
+    text = WHITESPACE_PATTERN.sub(' ', text).strip()
 
     return text
 
 
+def clean_text_series(series):
+    """
+    Vectorized clean_text() for a column of strings. The emoji pass is skipped because every
+    emoji is also removed by the non-letter pattern, so the output is identical.
+    """
+    series = series.where(series.map(type) == str, "")
+    return (
+        series.str.replace(URL_PATTERN, '', regex=True)
+        .str.replace(NON_LETTER_PATTERN, '', regex=True)
+        .str.lower()
+        .str.replace(WHITESPACE_PATTERN, ' ', regex=True)
+        .str.strip()
+    )
+
+
+def post_key_hashes(df):
+    """
+    Stable 64-bit hash of each post's (username, post_date, caption_text) key.
+    """
+    return pd.util.hash_pandas_object(df[POST_KEY_COLUMNS], index=False).to_numpy()
+
+
+def unseen_post_mask(hashes, seen_keys):
+    """
+    Marks the post key hashes that are not in seen_keys (a sorted uint64 array) and do not repeat an
+    earlier hash of the same batch.
+    """
+    keep = ~pd.Index(hashes).duplicated()
+    if len(seen_keys):
+        positions = np.searchsorted(seen_keys, hashes).clip(max=len(seen_keys) - 1)
+        keep &= seen_keys[positions] != hashes
+    return keep
+
+
+def merge_post_keys(seen_keys, new_keys):
+    """
+    Inserts new_keys (hashes kept by unseen_post_mask()) into the sorted seen_keys array. Only the
+    new keys are sorted, so the cost grows with the batch rather than with everything seen so far.
+    """
+    new_keys = np.sort(new_keys)
+    return np.insert(seen_keys, np.searchsorted(seen_keys, new_keys), new_keys)
+
+
+def is_parquet_path(path):
+    return str(path).endswith('.parquet')
+
+
+def load_posts(data_file_path, columns=None):
+    """
+    Loads preprocessed posts from a CSV or Parquet file. With columns, only those columns are
+    read; for Parquet the other columns are never decoded.
+    """
+    if is_parquet_path(data_file_path):
+        return pd.read_parquet(data_file_path, columns=columns)
+    usecols = None if columns is None else (lambda col: col in columns)
+    return pd.read_csv(data_file_path, usecols=usecols)
+
+
+def _posts_schema(df):
+    import pyarrow as pa
+
+    # Text columns may be all-null in one chunk, so pin them to string instead of inferring per chunk
+    return pa.schema([
+        pa.field(col, pa.string() if df[col].dtype == object else pa.from_numpy_dtype(df[col].dtype))
+        for col in df.columns
+    ])
+
+
+class PostsFileWriter:
+    """
+    Writes preprocessed posts chunk by chunk, as CSV or, for '.parquet' paths, as a Parquet file
+    with one row group per chunk.
+    """
+
+    def __init__(self, output_file_path):
+        self.output_file_path = output_file_path
+        self._parquet_writer = None
+        self._started = False
+
+    def write(self, df):
+        if is_parquet_path(self.output_file_path):
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            if self._parquet_writer is None:
+                self._parquet_writer = pq.ParquetWriter(self.output_file_path, _posts_schema(df))
+            table = pa.Table.from_pandas(df, schema=self._parquet_writer.schema, preserve_index=False)
+            self._parquet_writer.write_table(table)
+        else:
+            df.to_csv(self.output_file_path, mode='a' if self._started else 'w', header=not self._started, index=False)
+        self._started = True
+
+    def close(self):
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+            self._parquet_writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
 def preprocess_and_combine_data(existing_data_path,
                                 output_file_path='data/combined_preprocessed_influencer_data.csv'):
 
@@ -50,7 +179,7 @@ def preprocess_and_combine_data(existing_data_path,
         # Ensure 'post_date' is in a consistent format like 'DD/MM/YYYY'
         # Coerce errors will turn unparseable dates into NaT (Not a Time), which fillna handles.
         existing_df['post_date'] = pd.to_datetime(existing_df['post_date'], errors='coerce').dt.strftime(
-            '%d/%m/%Y').fillna('')
+            POST_DATE_FORMAT).fillna('')
 
         all_data_df = pd.concat([all_data_df, existing_df], ignore_index=True)
     except FileNotFoundError:
@@ -68,8 +197,7 @@ def preprocess_and_combine_data(existing_data_path,
     print("\nStarting data preprocessing...")
 
     # Ensure required columns exist, fill with empty string if missing
-    required_cols = ['platform', 'username', 'post_date', 'caption_text', 'post_type', 'likes', 'comments', 'hashtags']
-    for col in required_cols:
+    for col in REQUIRED_COLUMNS:
         if col not in all_data_df.columns:
             all_data_df[col] = ''  # Add missing column with empty strings
             print(f"Added missing column: '{col}'")
@@ -84,8 +212,8 @@ def preprocess_and_combine_data(existing_data_path,
         all_data_df[col] = pd.to_numeric(all_data_df[col], errors='coerce').fillna(0).astype(int)
 
     # Apply text cleaning to relevant columns
-    all_data_df['cleaned_caption'] = all_data_df['caption_text'].apply(clean_text)
-    all_data_df['cleaned_hashtags'] = all_data_df['hashtags'].apply(clean_text)
+    all_data_df['cleaned_caption'] = clean_text_series(all_data_df['caption_text'])
+    all_data_df['cleaned_hashtags'] = clean_text_series(all_data_df['hashtags'])
 
     # Drop duplicate rows based on a combination of identifying columns
     # This prevents duplicate posts if combining data from various sources or multiple runs.
@@ -95,9 +223,216 @@ def preprocess_and_combine_data(existing_data_path,
     print(all_data_df.head())
     print(f"Final data shape after cleaning: {all_data_df.shape}")
 
-    # Save the combined and preprocessed data to the specified output path
-    all_data_df.to_csv(output_file_path, index=False)
+    # Save the combined and preprocessed data to the specified output path (CSV, or Parquet for '.parquet')
+    with PostsFileWriter(output_file_path) as writer:
+        writer.write(all_data_df)
     print(f"\nCombined and preprocessed data saved to '{output_file_path}'")
     print("Columns in the final CSV:", all_data_df.columns.tolist())
 
-    return all_data_df
\ No newline at end of file
+    return all_data_df
+
+def update_score_averages(scores_df):
+    """
+    Recomputes avg_likes, avg_comments and score from the totals of an influencer score table,
+    rounded to two decimals like influencer_scores.csv.
+    """
+    scores_df['avg_likes'] = (scores_df['total_likes'] / scores_df['post_count']).round(2)
+    scores_df['avg_comments'] = (scores_df['total_comments'] / scores_df['post_count']).round(2)
+    scores_df['score'] = (scores_df['total_likes'] * SCORE_LIKES_WEIGHT).round(2)
+    return scores_df
+
+
+def compute_influencer_scores(posts_df, half_life_days=None, reference_date=None):
+    """
+    Builds the influencer score table (SCORE_COLUMNS) from preprocessed posts in one groupby pass,
+    sorted best score first (ties by username). score is SCORE_LIKES_WEIGHT of the total likes.
+    With half_life_days, each post's likes count for 0.5 ** (age in days / half_life_days) of their
+    value in the score, with ages counted back from reference_date (default: the latest post_date).
+    Undated posts then do not count towards the score. The totals and averages are never decayed.
+    """
+    posts = pd.DataFrame({
+        'username': posts_df['username'].astype(str).to_numpy(),
+        'likes': pd.to_numeric(posts_df['likes'], errors='coerce').fillna(0).astype(int).to_numpy(),
+        'comments': pd.to_numeric(posts_df['comments'], errors='coerce').fillna(0).astype(int).to_numpy(),
+    })
+    aggregations = {
+        'total_likes': ('likes', 'sum'),
+        'post_count': ('likes', 'size'),
+        'total_comments': ('comments', 'sum'),
+    }
+    if half_life_days:
+        dates = pd.to_datetime(posts_df['post_date'], format=POST_DATE_FORMAT, errors='coerce')
+        reference = pd.Timestamp(reference_date) if reference_date is not None else dates.max()
+        age_days = (reference - dates).dt.days.to_numpy(dtype=float)
+        weights = np.where(np.isnan(age_days), 0.0, 0.5 ** (np.clip(age_days, 0, None) / half_life_days))
+        posts['decayed_likes'] = posts['likes'].to_numpy() * weights
+        aggregations['decayed_likes'] = ('decayed_likes', 'sum')
+
+    scores_df = update_score_averages(posts.groupby('username', sort=False).agg(**aggregations))
+    if half_life_days:
+        scores_df['score'] = (scores_df.pop('decayed_likes') * SCORE_LIKES_WEIGHT).round(2)
+    return sort_scores(scores_df.reset_index())
+
+
+def sort_scores(scores_df):
+    """
+    Orders a score table best score first, ties by username, as influencer_scores.csv is stored.
+    """
+    scores_df = scores_df.sort_values(['score', 'username'], ascending=[False, True], kind='stable')
+    return scores_df[SCORE_COLUMNS].reset_index(drop=True)
+
+
+def write_influencer_scores(data_file_path, scores_file_path='data/influencer_scores.csv', half_life_days=None):
+    """
+    Computes the influencer score table of a preprocessed data file (CSV or Parquet), reading only
+    the columns it needs, and writes it as influencer_scores.csv. Returns the table.
+    """
+    scores_df = compute_influencer_scores(load_posts(data_file_path, columns=SCORE_POST_COLUMNS),
+                                          half_life_days=half_life_days)
+    save_influencer_scores(scores_df, scores_file_path, half_life_days=half_life_days)
+    print(f"Influencer scores for {len(scores_df)} influencers saved to '{scores_file_path}'")
+    return scores_df
+
+
+def save_influencer_scores(scores_df, scores_file_path, half_life_days=None):
+    """
+    Writes a score table. A decayed table records its half-life in a half_life_days column, so
+    later updates know to rebuild it with the same decay instead of adding undecayed likes.
+    """
+    if half_life_days:
+        scores_df = scores_df.assign(half_life_days=half_life_days)
+    scores_df.to_csv(scores_file_path, index=False)
+
+
+def score_half_life_days(scores_file_path):
+    """
+    The half-life a score table file was decayed with, or None for an undecayed (or missing) table.
+    """
+    try:
+        head = pd.read_csv(scores_file_path, nrows=1)
+    except (FileNotFoundError, pd.errors.EmptyDataError):
+        return None
+    if 'half_life_days' not in head.columns or head.empty or pd.isna(head['half_life_days'].iloc[0]):
+        return None
+    return float(head['half_life_days'].iloc[0])
+
+
+def preprocess_chunk(chunk, date_format=None):
+    """
+    Applies the same column, date, numeric and text cleaning steps as preprocess_and_combine_data()
+    to one chunk of raw posts.
+    """
+    chunk.columns = [col.lower().replace(' ', '_') for col in chunk.columns]
+
+    if 'post_date' in chunk.columns:
+        chunk['post_date'] = pd.to_datetime(chunk['post_date'], format=date_format, errors='coerce').dt.strftime(
+            POST_DATE_FORMAT).fillna('')
+
+    for col in REQUIRED_COLUMNS:
+        if col not in chunk.columns:
+            chunk[col] = ''
+
+    for col in ['caption_text', 'hashtags']:
+        chunk[col] = chunk[col].astype(str).fillna("")
+
+    for col in ['likes', 'comments']:
+        chunk[col] = pd.to_numeric(chunk[col], errors='coerce').fillna(0).astype(int)
+
+    chunk['cleaned_caption'] = clean_text_series(chunk['caption_text'])
+    chunk['cleaned_hashtags'] = clean_text_series(chunk['hashtags'])
+    return chunk
+
+
+def infer_date_format(chunk):
+    """
+    Guesses the post_date format from the first parseable value, so every chunk is parsed the same
+    way a single whole-file pd.to_datetime() call would parse it.
+    """
+    date_col = next((col for col in chunk.columns if col.lower().replace(' ', '_') == 'post_date'), None)
+    if date_col is None:
+        return None
+    for value in chunk[date_col].dropna():
+        date_format = pd.tseries.api.guess_datetime_format(str(value))
+        if date_format is not None:
+            return date_format
+    return None
+
+
+def preprocess_and_combine_data_streaming(existing_data_path,
+                                          output_file_path='data/combined_preprocessed_influencer_data.csv',
+                                          chunksize=100_000, workers=1):
+    """
+    Streaming version of preprocess_and_combine_data() for large scrapes. The input is read and
+    cleaned chunk by chunk and appended to the output file (CSV, or Parquet for '.parquet' paths),
+    so only a few chunks are in memory at a time. Duplicate posts are dropped with a sorted array of
+    64-bit post key hashes (8 bytes per unique post).
+    With workers > 1, chunks are cleaned in parallel processes; output order is preserved.
+    Returns a dict with row counts.
+    """
+    reader = pd.read_csv(existing_data_path, chunksize=chunksize, dtype=str)
+    print(f"Streaming data from {existing_data_path} in chunks of {chunksize} rows.")
+
+    first_chunk = next(reader, None)
+    if first_chunk is None:
+        print("Error: No data loaded. Nothing written.")
+        return {'rows_read': 0, 'rows_written': 0, 'duplicates_dropped': 0}
+
+    date_format = infer_date_format(first_chunk)
+    seen_keys = np.empty(0, dtype=np.uint64)
+    stats = {'rows_read': 0, 'rows_written': 0, 'duplicates_dropped': 0}
+    writer = PostsFileWriter(output_file_path)
+
+    def write_chunk(chunk):
+        nonlocal seen_keys
+        # Keep the first occurrence of each post, both within the chunk and across earlier chunks
+        hashes = post_key_hashes(chunk)
+        keep = unseen_post_mask(hashes, seen_keys)
+        seen_keys = merge_post_keys(seen_keys, hashes[keep])
+
+        deduped = chunk[keep]
+        writer.write(deduped)
+
+        stats['rows_read'] += len(chunk)
+        stats['rows_written'] += len(deduped)
+        stats['duplicates_dropped'] += len(chunk) - len(deduped)
+        print(f"Processed {stats['rows_read']} rows, written {stats['rows_written']}")
+
+    with writer:
+        write_chunk(preprocess_chunk(first_chunk, date_format))
+
+        if workers > 1:
+            with multiprocessing.Pool(workers) as pool:
+                # Hand out a bounded window of chunks at a time so reading never runs ahead of writing
+                while True:
+                    window = list(itertools.islice(reader, workers * 2))
+                    if not window:
+                        break
+                    for chunk in pool.starmap(preprocess_chunk, [(chunk, date_format) for chunk in window]):
+                        write_chunk(chunk)
+        else:
+            for chunk in reader:
+                write_chunk(preprocess_chunk(chunk, date_format))
+
+    print(f"\nCombined and preprocessed data saved to '{output_file_path}'")
+    print(f"Rows read: {stats['rows_read']}, written: {stats['rows_written']}, "
+          f"duplicates dropped: {stats['duplicates_dropped']}")
+    return stats
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Preprocess a raw influencer posts CSV in streaming mode.")
+    parser.add_argument('input_path')
+    parser.add_argument('output_path', nargs='?', default='data/combined_preprocessed_influencer_data.csv')
+    parser.add_argument('--chunksize', type=int, default=100_000)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--scores-file', help="Also write the influencer score table of the output here")
+    parser.add_argument('--half-life-days', type=float,
+                        help="Decay each post's likes in the score by this half-life (days before the latest post)")
+    args = parser.parse_args()
+
+    preprocess_and_combine_data_streaming(args.input_path, args.output_path,
+                                          chunksize=args.chunksize, workers=args.workers)
+    if args.scores_file:
+        write_influencer_scores(args.output_path, args.scores_file, half_life_days=args.half_life_days)
@@ -0,0 +1,301 @@
+# src/dataset_store.py
+
+import hashlib
+import threading
+import time
+
+from src.recommender_index import (
+    DEFAULT_DATA_FILE_PATH,
+    DEFAULT_INDEX_FILE_PATH,
+    RecommenderIndex,
+    file_signature,
+    load_or_build_index,
+    save_shared_index,
+)
+from src.ingest import DEFAULT_SEEN_KEYS_FILE_PATH, ingest_posts
+from src.result_cache import ResultCache
+from src.sharded_scoring import ShardedRecommender
+from src.score_table import DEFAULT_SCORES_FILE_PATH, InfluencerScoreTable
+
+# Seconds an index for a non-default data file is kept after it was built
+EXTRA_INDEX_TTL = 3600.0
+
+
+def _safe_signature(path):
+    try:
+        return file_signature(path)
+    except OSError:
+        return None
+
+
+def file_content_hash(path):
+    """
+    Short content hash of a data file, used as its dataset version.
+    """
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()[:12]
+
+
+class DatasetSnapshot:
+    """
+    Immutable view of everything built from the data files. Requests grab one snapshot and use it
+    until they finish, so a reload never changes data under an in-flight request.
+    """
+
+    __slots__ = ('recommender', 'scores', 'data_version', 'scores_version',
+                 'data_signature', 'scores_signature', 'loaded_at')
+
+    def __init__(self, recommender, scores, data_version, scores_version,
+                 data_signature, scores_signature):
+        self.recommender = recommender
+        self.scores = scores
+        self.data_version = data_version
+        self.scores_version = scores_version
+        self.data_signature = data_signature
+        self.scores_signature = scores_signature
+        self.loaded_at = time.time()
+
+    @property
+    def version(self):
+        return f"{self.data_version or 'none'}-{self.scores_version or 'none'}"
+
+
+class DatasetStore:
+    """
+    Holds the current DatasetSnapshot and rebuilds it when the data files change, either from a
+    background polling thread or on demand. Swapping the snapshot is a single reference assignment.
+    """
+
+    def __init__(self, data_file_path=DEFAULT_DATA_FILE_PATH, scores_file_path=DEFAULT_SCORES_FILE_PATH,
+                 index_file_path=DEFAULT_INDEX_FILE_PATH, seen_keys_file_path=DEFAULT_SEEN_KEYS_FILE_PATH,
+                 poll_interval=30.0, lsa_components=0, lsa_quantize=False, shards=0, shard_dir=None,
+                 extra_indexes=4):
+        self.data_file_path = data_file_path
+        self.scores_file_path = scores_file_path
+        self.index_file_path = index_file_path
+        self.seen_keys_file_path = seen_keys_file_path
+        self.poll_interval = poll_interval
+        # LSA embeddings fitted for every index the store builds (0 disables the 'lsa' engine)
+        self.lsa_components = lsa_components
+        self.lsa_quantize = lsa_quantize
+        # Worker processes scoring the default dataset's index (0 scores in the request thread).
+        # Each snapshot's shards memory-map a private copy of its index saved under shard_dir.
+        self.shards = shards
+        self.shard_dir = shard_dir
+
+        self._snapshot = None
+        self._reload_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._watcher = None
+        self._reload_listeners = []
+
+        # Indexes for data files other than the default one, built on demand. At most extra_indexes
+        # are kept (LRU), and each path has its own build lock so one slow build blocks only its path.
+        self._extra_indexes = ResultCache(max_size=extra_indexes, ttl_seconds=EXTRA_INDEX_TTL)
+        self._extra_index_builds = {}
+        self._extra_indexes_lock = threading.Lock()
+
+    @property
+    def snapshot(self):
+        return self._snapshot
+
+    def _build_recommender(self, previous, rebuild=False):
+        signature = _safe_signature(self.data_file_path)
+        if signature is None:
+            return None, None, None
+        if previous is not None and previous.data_signature == signature:
+            return previous.recommender, previous.data_version, signature
+
+        version = file_content_hash(self.data_file_path)
+        if previous is not None and previous.recommender is not None and previous.data_version == version:
+            # File was touched but its content did not change
+            return previous.recommender, version, signature
+
+        recommender = load_or_build_index(self.data_file_path, self.index_file_path,
+                                          lsa_components=self.lsa_components, lsa_quantize=self.lsa_quantize,
+                                          rebuild=rebuild)
+        return self._sharded(recommender), version, signature
+
+    def _sharded(self, recommender):
+        if not self.shards or recommender is None:
+            return recommender
+        return ShardedRecommender(recommender, self.shards, work_dir=self.shard_dir)
+
+    def _build_scores(self, previous):
+        signature = _safe_signature(self.scores_file_path)
+        if signature is None:
+            return None, None, None
+        if previous is not None and previous.scores_signature == signature:
+            return previous.scores, previous.scores_version, signature
+
+        version = file_content_hash(self.scores_file_path)
+        if previous is not None and previous.scores is not None and previous.scores_version == version:
+            return previous.scores, version, signature
+
+        scores = InfluencerScoreTable.from_csv(self.scores_file_path)
+        return scores, version, signature
+
+    def has_changes(self):
+        snapshot = self._snapshot
+        if snapshot is None:
+            return True
+        return (snapshot.data_signature != _safe_signature(self.data_file_path) or
+                snapshot.scores_signature != _safe_signature(self.scores_file_path))
+
+    def reload(self, force=False):
+        """
+        Rebuilds whatever changed on disk and swaps the new snapshot in. Returns True when a new
+        snapshot was installed. On failure the previous snapshot stays in place.
+        force=True rebuilds the index from the data file instead of loading the prebuilt one.
+        """
+        with self._reload_lock:
+            if not force and not self.has_changes():
+                return False
+
+            previous = None if force else self._snapshot
+            recommender, data_version, data_signature = self._build_recommender(previous, rebuild=force)
+            scores, scores_version, scores_signature = self._build_scores(previous)
+
+            self._install(DatasetSnapshot(
+                recommender, scores, data_version, scores_version, data_signature, scores_signature
+            ))
+            return True
+
+    def _install(self, snapshot):
+        previous = self._snapshot
+        self._snapshot = snapshot
+        if (previous is not None and isinstance(previous.recommender, ShardedRecommender) and
+                previous.recommender is not snapshot.recommender):
+            # Stops once the requests still holding the previous snapshot are done with it
+            previous.recommender.close()
+        for listener in self._reload_listeners:
+            listener(snapshot)
+
+    def ingest(self, delta_file_path):
+        """
+        Appends the new posts of delta_file_path to the dataset and swaps in a snapshot where only the
+        affected influencers were refreshed, instead of rebuilding everything. Returns ingest stats.
+        """
+        with self._reload_lock:
+            previous = self._snapshot
+            index = None
+            if previous is not None and previous.recommender is not None and previous.recommender.is_fresh(self.data_file_path):
+                index = previous.recommender
+                if isinstance(index, ShardedRecommender):
+                    index = index.index
+
+            # The in-memory index is updated in place of a rebuild, then saved as the prebuilt index
+            recommender, stats = ingest_posts(
+                delta_file_path, index=index, data_file_path=self.data_file_path,
+                scores_file_path=self.scores_file_path, seen_keys_file_path=self.seen_keys_file_path,
+                index_file_path=None,
+            )
+            if not stats['posts_added']:
+                return stats
+            if self.index_file_path:
+                save_shared_index(recommender, self.index_file_path)
+            recommender = self._sharded(recommender)
+
+            previous_version = previous.data_version if previous is not None else ''
+            data_version = hashlib.sha1(
+                f"{previous_version}:{stats['post_keys_digest']}".encode()
+            ).hexdigest()[:12]
+            scores, scores_version, scores_signature = self._build_scores(previous)
+
+            self._install(DatasetSnapshot(
+                recommender, scores, data_version, scores_version,
+                file_signature(self.data_file_path), scores_signature
+            ))
+            return stats
+
+    def add_reload_listener(self, listener):
+        """
+        Registers listener(snapshot), called after every snapshot swap (e.g. to drop cached results).
+        """
+        self._reload_listeners.append(listener)
+
+    def reload_in_background(self, force=False):
+        thread = threading.Thread(target=self._safe_reload, kwargs={'force': force},
+                                  name='dataset-reload', daemon=True)
+        thread.start()
+        return thread
+
+    def _safe_reload(self, force=False):
+        try:
+            if self.reload(force=force):
+                print(f"Dataset reloaded. Version: {self._snapshot.version}")
+        except Exception as e:
+            print(f"Dataset reload failed, keeping previous snapshot: {e}")
+
+    def _watch(self):
+        while not self._stop_event.wait(self.poll_interval):
+            self._safe_reload()
+
+    def start_watching(self):
+        if self.poll_interval <= 0 or self._watcher is not None:
+            return
+        self._stop_event.clear()
+        self._watcher = threading.Thread(target=self._watch, name='dataset-watcher', daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self):
+        self._stop_event.set()
+        if self._watcher is not None:
+            self._watcher.join(timeout=self.poll_interval)
+            self._watcher = None
+
+    def close(self):
+        """
+        Stops the watcher and any shard processes of the current snapshot.
+        """
+        self.stop_watching()
+        snapshot = self._snapshot
+        if snapshot is not None and isinstance(snapshot.recommender, ShardedRecommender):
+            snapshot.recommender.close()
+
+    def recommender_for(self, data_file_path=None):
+        """
+        Returns the recommender index for data_file_path, defaulting to the current snapshot's.
+        Raises FileNotFoundError when the data file does not exist.
+        """
+        if data_file_path is None or data_file_path == self.data_file_path:
+            snapshot = self._snapshot
+            if snapshot is None or snapshot.recommender is None:
+                raise FileNotFoundError(self.data_file_path)
+            return snapshot.recommender
+
+        index = self._extra_indexes.get(data_file_path)
+        if index is not None and index.is_fresh(data_file_path):
+            return index
+
+        with self._extra_indexes_lock:
+            build_lock, waiters = self._extra_index_builds.get(data_file_path, (threading.Lock(), 0))
+            self._extra_index_builds[data_file_path] = (build_lock, waiters + 1)
+        try:
+            with build_lock:
+                index = self._extra_indexes.get(data_file_path)
+                if index is None or not index.is_fresh(data_file_path):
+                    index = RecommenderIndex.from_data_file(data_file_path)
+                    if self.lsa_components:
+                        index = index.with_lsa(n_components=self.lsa_components, quantize=self.lsa_quantize)
+                    self._extra_indexes.put(data_file_path, index)
+                return index
+        finally:
+            with self._extra_indexes_lock:
+                build_lock, waiters = self._extra_index_builds[data_file_path]
+                if waiters == 1:
+                    del self._extra_index_builds[data_file_path]
+                else:
+                    self._extra_index_builds[data_file_path] = (build_lock, waiters - 1)
+
+        with self._extra_indexes_lock:
+            index = self._extra_indexes.get(data_file_path)
+            if index is None or not index.is_fresh(data_file_path):
+                index = RecommenderIndex.from_data_file(data_file_path)
+                if self.lsa_components:
+                    index = index.with_lsa(n_components=self.lsa_components, quantize=self.lsa_quantize)
+                self._extra_indexes[data_file_path] = index
+            return index
@@ -0,0 +1,188 @@
+# src/ingest.py
+
+import argparse
+import csv
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+
+from src.data_processor import (
+    POST_KEY_COLUMNS,
+    SCORE_COLUMNS,
+    SCORE_POST_COLUMNS,
+    compute_influencer_scores,
+    infer_date_format,
+    is_parquet_path,
+    load_posts,
+    merge_post_keys,
+    post_key_hashes,
+    preprocess_chunk,
+    save_influencer_scores,
+    score_half_life_days,
+    sort_scores,
+    unseen_post_mask,
+    update_score_averages,
+)
+from src.recommender_index import (
+    DEFAULT_DATA_FILE_PATH,
+    DEFAULT_INDEX_FILE_PATH,
+    file_signature,
+    load_or_build_index,
+)
+from src.score_table import DEFAULT_SCORES_FILE_PATH
+
+DEFAULT_SEEN_KEYS_FILE_PATH = 'data/seen_post_keys.npz'
+
+
+def load_seen_post_keys(seen_keys_file_path=DEFAULT_SEEN_KEYS_FILE_PATH, data_file_path=DEFAULT_DATA_FILE_PATH):
+    """
+    Sorted array of the post key hashes already in the dataset. They are read from
+    seen_keys_file_path when it was saved for the data file as it is now, and rebuilt from the data
+    file's key columns otherwise (first ingest, or the data file was regenerated since).
+    """
+    if os.path.exists(seen_keys_file_path) and os.path.exists(data_file_path):
+        with np.load(seen_keys_file_path) as saved:
+            if tuple(saved['data_signature']) == file_signature(data_file_path):
+                return saved['keys']
+    if not os.path.exists(data_file_path):
+        return np.empty(0, dtype=np.uint64)
+    if is_parquet_path(data_file_path):
+        keys_df = load_posts(data_file_path, columns=POST_KEY_COLUMNS).fillna('').astype(str)
+    else:
+        keys_df = pd.read_csv(data_file_path, usecols=POST_KEY_COLUMNS, dtype=str, keep_default_na=False)
+    return np.unique(post_key_hashes(keys_df))
+
+
+def save_seen_post_keys(seen_keys, seen_keys_file_path=DEFAULT_SEEN_KEYS_FILE_PATH,
+                        data_file_path=DEFAULT_DATA_FILE_PATH):
+    """
+    Saves the post key hashes of the data file together with its current signature, replacing the
+    previous file in one rename.
+    """
+    tmp_path = f"{seen_keys_file_path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, keys=seen_keys, data_signature=np.array(file_signature(data_file_path), dtype=np.int64))
+    os.replace(tmp_path, seen_keys_file_path)
+
+
+def filter_new_posts(posts_df, seen_keys):
+    """
+    Drops posts whose key is in seen_keys or repeats earlier in posts_df.
+    Returns the new posts and their key hashes.
+    """
+    keys_df = posts_df[POST_KEY_COLUMNS].fillna('').astype(str)
+    hashes = post_key_hashes(keys_df)
+    keep = unseen_post_mask(hashes, seen_keys)
+    return posts_df[keep], hashes[keep]
+
+
+def append_posts(posts_df, data_file_path=DEFAULT_DATA_FILE_PATH):
+    """
+    Appends preprocessed posts to the data file, in the data file's column order.
+    """
+    if is_parquet_path(data_file_path):
+        raise ValueError("Incremental ingestion appends to CSV data files; regenerate Parquet files "
+                         "with src.data_processor instead.")
+    if not os.path.exists(data_file_path):
+        posts_df.to_csv(data_file_path, index=False)
+        return
+    with open(data_file_path, newline='') as f:
+        header = next(csv.reader(f))
+    posts_df.reindex(columns=header, fill_value='').to_csv(data_file_path, mode='a', header=False, index=False)
+
+
+def update_score_table(posts_df, scores_file_path=DEFAULT_SCORES_FILE_PATH, data_file_path=DEFAULT_DATA_FILE_PATH):
+    """
+    Adds the new posts' likes, comments and post counts to the influencers' rows in the score table
+    (appending influencers it does not have yet) and recomputes their averages and score.
+    A decayed table is instead rebuilt from the data file's posts plus posts_df: every score
+    depends on the latest post date, so updating only the affected rows would mix scales.
+    """
+    half_life_days = score_half_life_days(scores_file_path)
+    if half_life_days:
+        all_posts = pd.concat([load_posts(data_file_path, columns=SCORE_POST_COLUMNS), posts_df[SCORE_POST_COLUMNS]],
+                              ignore_index=True)
+        save_influencer_scores(compute_influencer_scores(all_posts, half_life_days=half_life_days),
+                               scores_file_path, half_life_days=half_life_days)
+        return
+
+    delta = compute_influencer_scores(posts_df).set_index('username')
+
+    if os.path.exists(scores_file_path):
+        scores_df = pd.read_csv(scores_file_path)
+    else:
+        scores_df = pd.DataFrame(columns=SCORE_COLUMNS)
+    scores_df = scores_df.set_index('username')
+
+    existing = delta.index.intersection(scores_df.index)
+    for col in ['total_likes', 'post_count', 'total_comments']:
+        scores_df.loc[existing, col] = scores_df.loc[existing, col] + delta.loc[existing, col]
+    new_rows = delta.loc[delta.index.difference(scores_df.index)]
+    scores_df = pd.concat([scores_df, new_rows]).rename_axis('username')
+
+    affected = delta.index
+    scores_df.loc[affected] = update_score_averages(scores_df.loc[affected].copy())
+    scores_df = scores_df.astype({'total_likes': int, 'post_count': int, 'total_comments': int})
+    sort_scores(scores_df.reset_index()).to_csv(scores_file_path, index=False)
+
+
+def ingest_posts(delta_file_path, index=None, data_file_path=DEFAULT_DATA_FILE_PATH,
+                 scores_file_path=DEFAULT_SCORES_FILE_PATH, seen_keys_file_path=DEFAULT_SEEN_KEYS_FILE_PATH,
+                 index_file_path=DEFAULT_INDEX_FILE_PATH):
+    """
+    Ingests a delta file of raw posts (same layout as 'dataset - Sheet1.csv'): drops posts already in
+    the dataset, appends the rest to the data file, updates the affected influencers in the score
+    table and returns a recommender index with only those influencers' rows refreshed.
+    index defaults to the prebuilt index of data_file_path; the updated index is saved to
+    index_file_path when one is given. Returns (index, stats).
+    """
+    if is_parquet_path(data_file_path):
+        raise ValueError("Incremental ingestion appends to CSV data files; regenerate Parquet files "
+                         "with src.data_processor instead.")
+
+    # The index has to describe the data file as it is before the append
+    if index is None:
+        index = load_or_build_index(data_file_path, index_file_path)
+
+    raw_df = pd.read_csv(delta_file_path, dtype=str)
+    posts_df = preprocess_chunk(raw_df, infer_date_format(raw_df))
+
+    seen_keys = load_seen_post_keys(seen_keys_file_path, data_file_path)
+    new_posts, new_keys = filter_new_posts(posts_df, seen_keys)
+    stats = {
+        'posts_received': len(posts_df),
+        'posts_added': len(new_posts),
+        'duplicates_skipped': len(posts_df) - len(new_posts),
+        'influencers_updated': int(new_posts['username'].nunique()),
+    }
+    if new_posts.empty:
+        return index, stats
+
+    # Scores first: if they fail, nothing is appended yet and a retry ingests the posts again
+    update_score_table(new_posts, scores_file_path, data_file_path)
+    append_posts(new_posts, data_file_path)
+    save_seen_post_keys(merge_post_keys(seen_keys, new_keys), seen_keys_file_path, data_file_path)
+
+    index = index.with_posts(new_posts, source_signature=file_signature(data_file_path))
+    if index_file_path:
+        index.save(index_file_path)
+
+    stats['post_keys_digest'] = hashlib.sha1(new_keys.tobytes()).hexdigest()[:12]
+    return index, stats
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Append a delta file of new posts to the dataset.")
+    parser.add_argument('delta_path')
+    parser.add_argument('--data-file', default=DEFAULT_DATA_FILE_PATH)
+    parser.add_argument('--scores-file', default=DEFAULT_SCORES_FILE_PATH)
+    parser.add_argument('--seen-keys-file', default=DEFAULT_SEEN_KEYS_FILE_PATH)
+    parser.add_argument('--index-file', default=DEFAULT_INDEX_FILE_PATH)
+    args = parser.parse_args()
+
+    _, ingest_stats = ingest_posts(args.delta_path, data_file_path=args.data_file,
+                                   scores_file_path=args.scores_file, seen_keys_file_path=args.seen_keys_file,
+                                   index_file_path=args.index_file)
+    print(f"Ingested {args.delta_path}: {ingest_stats}")
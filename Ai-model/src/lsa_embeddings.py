@@ -0,0 +1,135 @@
+# src/lsa_embeddings.py
+
+import os
+
+import numpy as np
+from sklearn.decomposition import TruncatedSVD
+
+# Dimensions of the LSA space; each influencer costs this many float32 values (or bytes with int8)
+DEFAULT_LSA_COMPONENTS = 128
+
+# Rows of int8 embeddings converted to float32 at a time while scoring, to bound temporary memory
+QUANTIZED_BLOCK_ROWS = 8192
+
+
+def _normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return np.ascontiguousarray(matrix / norms, dtype=np.float32)
+
+
+def _quantize_rows(embeddings):
+    """
+    Symmetric per-row int8 quantization. Returns (int8 values, float32 scale per row).
+    """
+    scales = np.abs(embeddings).max(axis=1) / 127
+    scales[scales == 0] = 1
+    quantized = np.rint(embeddings / scales[:, None]).astype(np.int8)
+    return np.ascontiguousarray(quantized), scales.astype(np.float32)
+
+
+class LsaEmbeddings:
+    """
+    Dense low-rank (LSA) view of the influencer TF-IDF matrix: one L2-normalized float32 vector
+    per influencer, optionally stored as int8 with a per-row scale. Queries are projected with the
+    same SVD components and scored with one BLAS matrix product.
+    """
+
+    def __init__(self, projection, embeddings, scales=None):
+        # (terms x components), C-contiguous so sparse query rows multiply it without a copy
+        self.projection = projection
+        self.embeddings = embeddings
+        self.scales = scales
+
+    def __len__(self):
+        return self.embeddings.shape[0]
+
+    @property
+    def quantized(self):
+        return self.scales is not None
+
+    @property
+    def nbytes(self):
+        """
+        Memory held by the per-influencer vectors and the projection matrix.
+        """
+        scales_nbytes = self.scales.nbytes if self.scales is not None else 0
+        return self.projection.nbytes + self.embeddings.nbytes + scales_nbytes
+
+    @classmethod
+    def fit(cls, tfidf_matrix, n_components=DEFAULT_LSA_COMPONENTS, quantize=False, random_state=0):
+        """
+        Fits a TruncatedSVD of the influencer TF-IDF matrix and keeps the normalized projections.
+        """
+        n_components = max(1, min(n_components, min(tfidf_matrix.shape) - 1))
+        svd = TruncatedSVD(n_components=n_components, algorithm='randomized', random_state=random_state)
+        embeddings = _normalize_rows(svd.fit_transform(tfidf_matrix))
+        projection = np.ascontiguousarray(svd.components_.T, dtype=np.float32)
+        if quantize:
+            return cls(projection, *_quantize_rows(embeddings))
+        return cls(projection, embeddings)
+
+    def project(self, tfidf_rows):
+        """
+        Maps TF-IDF rows (queries, or influencer rows folded in later) into the LSA space.
+        """
+        # float32 rows, or the product would first upcast the whole projection to float64
+        return _normalize_rows(np.asarray(tfidf_rows.astype(np.float32) @ self.projection))
+
+    def similarities(self, query_matrix, rows=None):
+        """
+        Cosine similarity in the LSA space of each TF-IDF query row against every influencer
+        (or only the given rows), as a dense (influencers x queries) float32 array.
+        """
+        queries = self.project(query_matrix).T
+        embeddings = self.embeddings if rows is None else self.embeddings[rows]
+        if not self.quantized:
+            return embeddings @ queries
+
+        scales = self.scales if rows is None else self.scales[rows]
+        result = np.empty((embeddings.shape[0], queries.shape[1]), dtype=np.float32)
+        for start in range(0, embeddings.shape[0], QUANTIZED_BLOCK_ROWS):
+            block = embeddings[start:start + QUANTIZED_BLOCK_ROWS].astype(np.float32)
+            result[start:start + QUANTIZED_BLOCK_ROWS] = block @ queries
+        result *= scales[:, None]
+        return result
+
+    def with_rows(self, tfidf_rows, row_ids, n_rows):
+        """
+        Returns embeddings with n_rows rows where the rows row_ids are re-projected from
+        tfidf_rows (folding in updated or new influencers without refitting the SVD).
+        """
+        projected = self.project(tfidf_rows)
+        if self.quantized:
+            projected, projected_scales = _quantize_rows(projected)
+            scales = np.zeros(n_rows, dtype=np.float32)
+            scales[:len(self.scales)] = self.scales
+            scales[row_ids] = projected_scales
+        else:
+            scales = None
+
+        embeddings = np.zeros((n_rows, self.embeddings.shape[1]), dtype=self.embeddings.dtype)
+        embeddings[:len(self.embeddings)] = self.embeddings
+        embeddings[row_ids] = projected
+        return LsaEmbeddings(self.projection, embeddings, scales)
+
+    def save(self, index_dir):
+        np.save(os.path.join(index_dir, 'lsa_projection.npy'), self.projection)
+        np.save(os.path.join(index_dir, 'lsa_embeddings.npy'), self.embeddings)
+        if self.scales is not None:
+            np.save(os.path.join(index_dir, 'lsa_scales.npy'), self.scales)
+
+    @classmethod
+    def load(cls, index_dir, mmap_mode=None):
+        """
+        Loads embeddings saved next to a recommender index, or returns None when there are none.
+        """
+        embeddings_path = os.path.join(index_dir, 'lsa_embeddings.npy')
+        if not os.path.exists(embeddings_path):
+            return None
+        scales_path = os.path.join(index_dir, 'lsa_scales.npy')
+        return cls(
+            np.load(os.path.join(index_dir, 'lsa_projection.npy')),
+            np.load(embeddings_path, mmap_mode=mmap_mode),
+            np.load(scales_path, mmap_mode=mmap_mode) if os.path.exists(scales_path) else None,
+        )
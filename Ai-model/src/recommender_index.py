@@ -0,0 +1,785 @@
+# src/recommender_index.py
+
+import argparse
+import copy
+import json
+import os
+import shutil
+from typing import NamedTuple
+
+import joblib
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import CountVectorizer, TfidfTransformer
+from sklearn.pipeline import Pipeline
+
+from src.data_processor import POST_DATE_FORMAT, load_posts
+from src.lsa_embeddings import DEFAULT_LSA_COMPONENTS, LsaEmbeddings
+from src.metrics import NULL_TIMER
+from src.result_cache import ResultCache
+
+DEFAULT_DATA_FILE_PATH = 'data/combined_preprocessed_influencer_data.csv'
+DEFAULT_INDEX_FILE_PATH = 'data/recommender_index'
+
+# Bumped whenever the on-disk index layout changes; older index directories are rebuilt
+INDEX_FORMAT_VERSION = 4
+
+# Columns the recommender actually needs from the preprocessed data
+RECOMMENDER_COLUMNS = ['username', 'cleaned_caption', 'cleaned_hashtags', 'likes', 'comments',
+                       'platform', 'post_type', 'post_date']
+
+# Scoring engines selectable per request: exact sparse TF-IDF cosine, or the dense LSA projection
+ENGINES = ['sparse', 'lsa']
+
+# Post columns with a precomputed row mask per value, for request filters
+PARTITION_COLUMNS = ['platform', 'post_type']
+
+# Number of queries scored per sparse matrix product in recommend_many()
+QUERY_BATCH_SIZE = 256
+
+# platform/post_type combinations whose posting lists are kept per index; each holds a copy of
+# the matching rows
+PARTITION_POSTINGS_CACHE_SIZE = 8
+
+
+def file_signature(path):
+    """
+    Returns a cheap (mtime, size) signature used to detect that a data file changed on disk.
+    """
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def build_tfidf_vectorizer():
+    """
+    TF-IDF settings shared by every recommender index build. Equivalent to a TfidfVectorizer, split
+    into its count and weighting steps so the raw term counts can be kept for incremental updates.
+    """
+    return Pipeline([
+        ('counts', CountVectorizer(
+            stop_words='english',
+            max_features=10000,  # Increased vocabulary
+            min_df=1,            # Include words that appear at least once
+            max_df=0.95,         # Exclude very common words
+            ngram_range=(1, 2),  # Include unigrams and bigrams
+        )),
+        ('tfidf', TfidfTransformer(
+            sublinear_tf=True    # Apply sublinear tf scaling
+        )),
+    ])
+
+
+def aggregate_influencer_profiles(df):
+    """
+    Collapses post-level rows into one row per influencer with the concatenated profile text,
+    the likes/comments totals and post count, and the average likes/comments used as engagement metrics.
+    """
+    # Ensure 'cleaned_caption' and 'cleaned_hashtags' columns exist and are string type
+    for col in ['cleaned_caption', 'cleaned_hashtags']:
+        if col not in df.columns:
+            raise ValueError(f"Required column '{col}' not found in the preprocessed data.")
+        df[col] = df[col].astype(str).fillna("")
+
+    # Combine relevant text columns for each post.
+    df['combined_post_text'] = df['cleaned_caption'] + " " + df['cleaned_hashtags']
+
+    # Group by username to get a single, comprehensive text representation for each influencer.
+    influencer_content = df.groupby('username')['combined_post_text'].apply(lambda x: " ".join(x)).reset_index()
+    influencer_content.rename(columns={'combined_post_text': 'influencer_profile_text'}, inplace=True)
+
+    # Calculate total and average likes and comments for each influencer (engagement metrics)
+    influencer_engagement = df.groupby('username').agg(
+        total_likes=('likes', 'sum'),
+        total_comments=('comments', 'sum'),
+        post_count=('likes', 'size'),
+        avg_likes=('likes', 'mean'),
+        avg_comments=('comments', 'mean'),
+    ).reset_index()
+
+    # Merge content and engagement data into a single DataFrame for influencers
+    return pd.merge(influencer_content, influencer_engagement, on='username', how='left')
+
+
+def post_partitions(posts_df, usernames):
+    """
+    For each PARTITION_COLUMNS column, maps every value (case-folded) to a boolean mask over the
+    influencer rows (in the order of usernames) marking influencers with at least one such post.
+    """
+    rows = pd.Index(usernames).get_indexer(posts_df['username'])
+    partitions = {}
+    for col in PARTITION_COLUMNS:
+        values = posts_df[col].fillna('').astype(str).str.strip().str.casefold().to_numpy()
+        partitions[col] = {}
+        for value, value_rows in pd.Series(rows).groupby(values):
+            if not value:
+                continue
+            mask = np.zeros(len(usernames), dtype=bool)
+            mask[value_rows.to_numpy()] = True
+            partitions[col][value] = mask
+    return partitions
+
+
+def post_date_postings(posts_df, usernames):
+    """
+    Every dated post as (day, influencer row), sorted by day, so a date window is a slice.
+    """
+    dates = pd.to_datetime(posts_df['post_date'], format=POST_DATE_FORMAT, errors='coerce')
+    rows = pd.Index(usernames).get_indexer(posts_df['username'])
+    dated = dates.notna().to_numpy()
+    days = dates.to_numpy()[dated].astype('datetime64[D]')
+    order = np.argsort(days, kind='stable')
+    return days[order], rows[dated][order]
+
+
+class EngineUnavailable(Exception):
+    """
+    Raised when a request selects a scoring engine this index was not built with.
+    """
+
+
+class RecommenderIndex:
+    """
+    In-memory recommendation index: the fitted TF-IDF vocabulary/IDF, the influencer profile
+    matrix, its term -> influencer posting lists, the engagement aggregates and the filter
+    partitions, plus optional LSA embeddings. Built once, then only queries are transformed.
+    """
+
+    def __init__(self, influencers_df, vectorizer, tfidf_matrix, term_counts,
+                 source_path=None, source_signature=None, engagement_scores=None, postings=None,
+                 partitions=None, post_dates=None, post_date_rows=None, lsa=None):
+        self.influencers_df = influencers_df
+        self.vectorizer = vectorizer
+        self.tfidf_matrix = tfidf_matrix
+        self.term_counts = term_counts
+        # Same weights as tfidf_matrix, stored column-wise: column t lists the influencers using term t
+        self.postings = postings if postings is not None else tfidf_matrix.tocsc()
+        self.partitions = partitions if partitions is not None else {}
+        self.post_dates = post_dates if post_dates is not None else np.empty(0, dtype='datetime64[D]')
+        self.post_date_rows = post_date_rows if post_date_rows is not None else np.empty(0, dtype=np.intp)
+        self.lsa = lsa
+        self._partition_postings = ResultCache(max_size=PARTITION_POSTINGS_CACHE_SIZE, ttl_seconds=float('inf'))
+        self.source_path = source_path
+        self.source_signature = source_signature
+
+        # Engagement part of the final score does not depend on the query, so compute it once
+        avg_likes = influencers_df['avg_likes']
+        avg_comments = influencers_df['avg_comments']
+        if engagement_scores is not None:
+            self.engagement_scores = engagement_scores
+        elif avg_likes.max() > 0:
+            self.engagement_scores = (
+                0.7 * (avg_likes / avg_likes.max()) +
+                0.3 * (avg_comments / avg_comments.max())
+            ).to_numpy()
+        else:
+            self.engagement_scores = np.zeros(len(influencers_df))
+        # Highest engagement first, ties by position; ranks influencers that share no query term
+        self.engagement_order = np.argsort(-np.asarray(self.engagement_scores), kind='stable')
+
+    def __len__(self):
+        return len(self.influencers_df)
+
+    @classmethod
+    def from_dataframe(cls, df, source_path=None, source_signature=None):
+        influencers_df = aggregate_influencer_profiles(df)
+        post_dates, post_date_rows = post_date_postings(df, influencers_df['username'])
+
+        # Fit the vectorizer on the influencer profile texts only; queries are transformed later
+        vectorizer = build_tfidf_vectorizer()
+        term_counts = vectorizer.named_steps['counts'].fit_transform(influencers_df.pop('influencer_profile_text'))
+        tfidf_matrix = vectorizer.named_steps['tfidf'].fit_transform(term_counts)
+
+        return cls(influencers_df, vectorizer, tfidf_matrix, term_counts,
+                   source_path=source_path, source_signature=source_signature,
+                   partitions=post_partitions(df, influencers_df['username']),
+                   post_dates=post_dates, post_date_rows=post_date_rows)
+
+    @classmethod
+    def from_data_file(cls, data_file_path=DEFAULT_DATA_FILE_PATH):
+        """
+        Builds the index from a preprocessed CSV or Parquet file, reading only the columns it needs.
+        """
+        signature = file_signature(data_file_path)
+        df = load_posts(data_file_path, columns=RECOMMENDER_COLUMNS)
+        return cls.from_dataframe(df, source_path=data_file_path, source_signature=signature)
+
+    def save(self, index_dir=DEFAULT_INDEX_FILE_PATH):
+        """
+        Writes the index as a directory of .npy arrays (sparse matrices as data/indices/indptr) plus
+        the small vectorizer and influencer table, so load() can memory-map the large parts.
+        The directory is replaced in one rename; processes that mapped the old files keep them.
+        """
+        # Per-process names, so workers saving the same index at once do not clobber each other
+        tmp_dir = f"{index_dir}.tmp-{os.getpid()}"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+
+        for name, matrix in [('tfidf_matrix', self.tfidf_matrix.tocsr()), ('term_counts', self.term_counts.tocsr()),
+                             ('postings', self.postings.tocsc())]:
+            for part in ['data', 'indices', 'indptr']:
+                np.save(os.path.join(tmp_dir, f"{name}_{part}.npy"), getattr(matrix, part))
+        np.save(os.path.join(tmp_dir, 'engagement_scores.npy'), np.asarray(self.engagement_scores))
+        np.save(os.path.join(tmp_dir, 'post_dates.npy'), self.post_dates)
+        np.save(os.path.join(tmp_dir, 'post_date_rows.npy'), self.post_date_rows)
+        joblib.dump(self.partitions, os.path.join(tmp_dir, 'partitions.joblib'))
+        if self.lsa is not None:
+            self.lsa.save(tmp_dir)
+        joblib.dump(self.vectorizer, os.path.join(tmp_dir, 'vectorizer.joblib'))
+        joblib.dump(self.influencers_df, os.path.join(tmp_dir, 'influencers.joblib'))
+
+        with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+            json.dump({
+                'format_version': INDEX_FORMAT_VERSION,
+                'source_path': self.source_path,
+                'source_signature': list(self.source_signature) if self.source_signature else None,
+                'shape': list(self.tfidf_matrix.shape),
+            }, f)
+
+        old_dir = f"{index_dir}.old-{os.getpid()}"
+        shutil.rmtree(old_dir, ignore_errors=True)
+        if os.path.exists(index_dir):
+            os.rename(index_dir, old_dir)
+        os.rename(tmp_dir, index_dir)
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+    @classmethod
+    def load(cls, index_dir=DEFAULT_INDEX_FILE_PATH, mmap=True):
+        """
+        Loads an index written by save(). With mmap, the matrices and engagement scores are
+        memory-mapped read-only, so worker processes loading the same index share its pages.
+        """
+        with open(os.path.join(index_dir, 'meta.json')) as f:
+            meta = json.load(f)
+        if meta.get('format_version') != INDEX_FORMAT_VERSION:
+            raise ValueError(f"'{index_dir}' was written by an incompatible index format.")
+
+        mmap_mode = 'r' if mmap else None
+
+        def load_array(name):
+            return np.load(os.path.join(index_dir, f"{name}.npy"), mmap_mode=mmap_mode)
+
+        def load_matrix(name, matrix_class=sp.csr_matrix):
+            return matrix_class(
+                (load_array(f"{name}_data"), load_array(f"{name}_indices"), load_array(f"{name}_indptr")),
+                shape=tuple(meta['shape']), copy=False
+            )
+
+        signature = meta['source_signature']
+        return cls(
+            joblib.load(os.path.join(index_dir, 'influencers.joblib')),
+            joblib.load(os.path.join(index_dir, 'vectorizer.joblib')),
+            load_matrix('tfidf_matrix'),
+            load_matrix('term_counts'),
+            source_path=meta['source_path'],
+            source_signature=tuple(signature) if signature else None,
+            engagement_scores=load_array('engagement_scores'),
+            postings=load_matrix('postings', sp.csc_matrix),
+            partitions=joblib.load(os.path.join(index_dir, 'partitions.joblib')),
+            post_dates=load_array('post_dates'),
+            post_date_rows=load_array('post_date_rows'),
+            lsa=LsaEmbeddings.load(index_dir, mmap_mode=mmap_mode),
+        )
+
+    def with_lsa(self, n_components=DEFAULT_LSA_COMPONENTS, quantize=False):
+        """
+        Returns a copy of this index with LSA embeddings fitted from its TF-IDF matrix.
+        """
+        index = copy.copy(self)
+        index.lsa = LsaEmbeddings.fit(self.tfidf_matrix, n_components=n_components, quantize=quantize)
+        return index
+
+    def row_range(self, start, stop):
+        """
+        Sub-index over influencer rows [start, stop), used as one shard of sharded scoring. It keeps
+        the whole index's vocabulary and engagement scaling, so its scores equal the full index's.
+        """
+        in_range = (self.post_date_rows >= start) & (self.post_date_rows < stop)
+        lsa = None
+        if self.lsa is not None:
+            lsa = LsaEmbeddings(self.lsa.projection, self.lsa.embeddings[start:stop],
+                                self.lsa.scales[start:stop] if self.lsa.quantized else None)
+        return RecommenderIndex(
+            self.influencers_df.iloc[start:stop].reset_index(drop=True), self.vectorizer,
+            self.tfidf_matrix[start:stop], self.term_counts[start:stop],
+            source_path=self.source_path, source_signature=self.source_signature,
+            engagement_scores=np.asarray(self.engagement_scores)[start:stop],
+            partitions={col: {value: mask[start:stop] for value, mask in values.items()}
+                        for col, values in self.partitions.items()},
+            post_dates=self.post_dates[in_range], post_date_rows=self.post_date_rows[in_range] - start,
+            lsa=lsa,
+        )
+
+    def is_fresh(self, data_file_path):
+        """
+        True when this index was built from the current contents of data_file_path.
+        """
+        try:
+            return self.source_signature == file_signature(data_file_path)
+        except OSError:
+            return False
+
+    def with_posts(self, posts_df, source_signature=None):
+        """
+        Returns a new index that also includes posts_df (preprocessed posts not seen before).
+        Only the influencers in posts_df are re-weighted; everyone else keeps their existing rows.
+        The vocabulary and IDF stay frozen until the next full build, so terms that are new to the
+        vocabulary are ignored, as is the one bigram spanning an influencer's old and new text.
+        LSA embeddings of the affected influencers are re-projected with the existing SVD.
+        """
+        delta = aggregate_influencer_profiles(posts_df.copy())
+        delta_texts = delta.pop('influencer_profile_text')
+        n_old = len(self)
+
+        # Map each influencer in the delta to its row; new influencers are appended at the end
+        row_ids = pd.Index(self.influencers_df['username']).get_indexer(delta['username'])
+        is_new = row_ids < 0
+        row_ids[is_new] = np.arange(n_old, n_old + is_new.sum())
+        n_total = n_old + int(is_new.sum())
+
+        influencers_df = pd.concat(
+            [self.influencers_df, delta.loc[is_new, self.influencers_df.columns]], ignore_index=True
+        )
+        existing = delta.loc[~is_new]
+        existing_rows = row_ids[~is_new]
+        if len(existing):
+            for col in ['total_likes', 'total_comments', 'post_count']:
+                col_pos = influencers_df.columns.get_loc(col)
+                influencers_df.iloc[existing_rows, col_pos] = (
+                    influencers_df[col].to_numpy()[existing_rows] + existing[col].to_numpy()
+                )
+            influencers_df['avg_likes'] = influencers_df['total_likes'] / influencers_df['post_count']
+            influencers_df['avg_comments'] = influencers_df['total_comments'] / influencers_df['post_count']
+
+        # Add the delta's term counts to the affected rows and re-weight only those rows
+        delta_counts = self.vectorizer.named_steps['counts'].transform(delta_texts)
+        scatter = _row_scatter_matrix(row_ids, n_total)
+        term_counts = _pad_rows(self.term_counts, n_total) + scatter @ delta_counts
+        affected_tfidf = self.vectorizer.named_steps['tfidf'].transform(term_counts[row_ids])
+
+        keep = np.ones(n_total)
+        keep[row_ids] = 0
+        tfidf_matrix = sp.diags(keep) @ _pad_rows(self.tfidf_matrix, n_total) + scatter @ affected_tfidf
+        tfidf_matrix.eliminate_zeros()
+        tfidf_matrix.sort_indices()
+
+        # New posts can only add influencers to partitions and dates to the date postings
+        delta_partitions = post_partitions(posts_df, influencers_df['username'])
+        partitions = {}
+        for col in PARTITION_COLUMNS:
+            values = set(self.partitions.get(col, {})) | set(delta_partitions[col])
+            partitions[col] = {
+                value: (
+                    _pad_mask(self.partitions.get(col, {}).get(value), n_total) |
+                    _pad_mask(delta_partitions[col].get(value), n_total)
+                )
+                for value in values
+            }
+        delta_dates, delta_date_rows = post_date_postings(posts_df, influencers_df['username'])
+        post_dates = np.concatenate([self.post_dates, delta_dates])
+        order = np.argsort(post_dates, kind='stable')
+
+        lsa = self.lsa.with_rows(affected_tfidf, row_ids, n_total) if self.lsa is not None else None
+
+        return RecommenderIndex(influencers_df, self.vectorizer, tfidf_matrix.tocsr(), term_counts.tocsr(),
+                                source_path=self.source_path, source_signature=source_signature,
+                                partitions=partitions, post_dates=post_dates[order],
+                                post_date_rows=np.concatenate([self.post_date_rows, delta_date_rows])[order],
+                                lsa=lsa)
+
+    def filter_mask(self, platforms=None, post_types=None, min_avg_likes=None, max_avg_likes=None,
+                    min_avg_comments=None, max_avg_comments=None, posted_after=None, posted_before=None):
+        """
+        Boolean mask of the influencers matching every given filter, or None when no filter is set.
+        platforms and post_types match influencers with at least one such post (case-insensitive);
+        posted_after/posted_before (inclusive dates) match influencers with a post in that window.
+        """
+        masks = []
+        for col, values in [('platform', platforms), ('post_type', post_types)]:
+            if values is None:
+                continue
+            partition = self.partitions.get(col, {})
+            mask = np.zeros(len(self), dtype=bool)
+            for value in values:
+                value_mask = partition.get(str(value).strip().casefold())
+                if value_mask is not None:
+                    mask |= value_mask
+            masks.append(mask)
+
+        for col, low, high in [('avg_likes', min_avg_likes, max_avg_likes),
+                               ('avg_comments', min_avg_comments, max_avg_comments)]:
+            values = self.influencers_df[col].to_numpy()
+            if low is not None:
+                masks.append(values >= low)
+            if high is not None:
+                masks.append(values <= high)
+
+        if posted_after is not None or posted_before is not None:
+            start = 0 if posted_after is None else np.searchsorted(
+                self.post_dates, np.datetime64(posted_after, 'D'), side='left')
+            end = len(self.post_dates) if posted_before is None else np.searchsorted(
+                self.post_dates, np.datetime64(posted_before, 'D'), side='right')
+            mask = np.zeros(len(self), dtype=bool)
+            mask[self.post_date_rows[start:end]] = True
+            masks.append(mask)
+
+        return np.logical_and.reduce(masks) if masks else None
+
+    def recommend(self, expanded_description, top_n=5, filters=None, engine='sparse', timer=NULL_TIMER):
+        """
+        Ranks influencers against an already expanded business description and returns the
+        top_n rows by the 70% similarity / 30% engagement blend (top_n=None returns the whole
+        ranking). filters are filter_mask() keyword arguments; only matching influencers are scored and ranked. engine is one of
+        ENGINES. timer (a metrics.StageTimer) receives the time spent in each stage.
+        """
+        return self.recommend_many([expanded_description], top_n=top_n, filters=filters, engine=engine,
+                                   timer=timer)[0]
+
+    def recommend_many(self, expanded_descriptions, top_n=5, filters=None, engine='sparse', timer=NULL_TIMER):
+        """
+        Batch version of recommend(). Descriptions are transformed in chunks, then each query is
+        ranked from the posting lists of its own terms (of the matching influencers' partition when
+        filtered). Returns one DataFrame per description.
+        """
+        self.check_engine(engine)
+        if top_n is None:
+            top_n = len(self)
+        if engine == 'lsa':
+            return self._recommend_many_lsa(expanded_descriptions, top_n, filters, timer)
+
+        allowed, pool_size, postings = None, None, None
+        if filters:
+            with timer.stage('filter'):
+                allowed, pool_size, postings = self.filter_pool(filters)
+
+        results = []
+        for start in range(0, len(expanded_descriptions), QUERY_BATCH_SIZE):
+            with timer.stage('vectorize'):
+                query_matrix = self.vectorizer.transform(expanded_descriptions[start:start + QUERY_BATCH_SIZE])
+            for i in range(query_matrix.shape[0]):
+                query = query_matrix[i]
+                with timer.stage('similarity'):
+                    candidates, similarities = self.candidate_similarities(query.indices, query.data, postings,
+                                                                           allowed)
+                with timer.stage('top_k'):
+                    ranked = self._rank_candidates(candidates, similarities, top_n, allowed=allowed, pool_size=pool_size)
+                with timer.stage('result_frame'):
+                    results.append(self._result_frame(*ranked))
+        return results
+
+    def check_engine(self, engine):
+        """
+        Raises ValueError for an unknown engine, and EngineUnavailable for one this index cannot serve.
+        """
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine '{engine}'. Expected one of {ENGINES}.")
+        if engine == 'lsa' and self.lsa is None:
+            raise EngineUnavailable("This index has no LSA embeddings. Build them with "
+                                    "'python -m src.recommender_index --lsa-components N' or RECOMMENDER_LSA_COMPONENTS.")
+
+    def _recommend_many_lsa(self, expanded_descriptions, top_n, filters, timer=NULL_TIMER):
+        rows = None
+        if filters:
+            with timer.stage('filter'):
+                rows = np.flatnonzero(self.filter_mask(**filters))
+
+        results = []
+        for start in range(0, len(expanded_descriptions), QUERY_BATCH_SIZE):
+            with timer.stage('vectorize'):
+                query_matrix = self.vectorizer.transform(expanded_descriptions[start:start + QUERY_BATCH_SIZE])
+            with timer.stage('similarity'):
+                similarities = self.lsa.similarities(query_matrix, rows)
+            for i in range(similarities.shape[1]):
+                with timer.stage('top_k'):
+                    ranked = self._rank(similarities[:, i], top_n, rows)
+                with timer.stage('result_frame'):
+                    results.append(self._result_frame(*ranked))
+        return results
+
+    def filter_pool(self, filters):
+        """
+        Influencers matching filters (filter_mask() keyword arguments), for a filtered sparse query.
+        Returns (allowed mask, number of allowed influencers, postings to score from).
+        The mask is rebuilt per request, which is cheap. The postings come from the platform/post_type
+        partition when one of those filters is set, and otherwise from the whole index.
+        Partition postings are built on first use and cached, because those combinations are few;
+        the other filters take arbitrary values and would never hit a cache.
+        """
+        allowed = self.filter_mask(**filters)
+        if allowed is None:
+            return None, None, None
+
+        categorical = {name: filters[name] for name in ['platforms', 'post_types'] if filters.get(name) is not None}
+        postings = None
+        if categorical:
+            key = tuple(sorted((name, tuple(sorted({str(value).strip().casefold() for value in values})))
+                               for name, values in categorical.items()))
+            postings = self._partition_postings.get(key)
+            if postings is None:
+                partition_rows = np.flatnonzero(self.filter_mask(**categorical))
+                postings = _PartitionPostings(self.tfidf_matrix[partition_rows].tocsc(), partition_rows)
+                self._partition_postings.put(key, postings)
+        return allowed, int(allowed.sum()), postings
+
+    def candidate_similarities(self, terms, weights, postings=None, allowed=None):
+        """
+        Cosine similarity of a query (its term ids and TF-IDF weights) against the influencers that
+        share at least one term with it, accumulated from those terms' posting lists only.
+        Every other influencer has similarity 0. postings defaults to the whole index; a
+        filter_pool() partition limits the candidates to its influencers, and an allowed mask
+        keeps only the candidates it marks.
+        Returns (sorted candidate rows, similarities).
+        """
+        if postings is not None:
+            local_candidates, similarities = _accumulate_postings(postings.matrix, terms, weights)
+            candidates = postings.rows[local_candidates]
+        else:
+            candidates, similarities = _accumulate_postings(self.postings, terms, weights)
+        if allowed is not None:
+            keep = allowed[candidates]
+            candidates, similarities = candidates[keep], similarities[keep]
+        return candidates, similarities
+
+    def similarities(self, query_matrix):
+        """
+        Cosine similarity of each query row against every influencer, as a dense (queries x influencers)
+        array. TF-IDF rows are L2-normalized, so the dot product is the cosine.
+        """
+        return (self.tfidf_matrix @ query_matrix.T).T.toarray()
+
+    def _rank(self, cosine_similarities, top_n, rows=None, similarity_range=None):
+        """
+        Exhaustive ranking from a dense row of similarities against every influencer, or against
+        the given rows only. Returns the top rows with their similarity, normalized similarity and
+        final score, for _result_frame(). similarity_range overrides the (min, max) used to
+        normalize, when this index is one shard of the ranked pool.
+        """
+        engagement_scores = self.engagement_scores if rows is None else self.engagement_scores[rows]
+        if similarity_range is not None:
+            min_similarity, max_similarity = similarity_range
+        elif len(cosine_similarities):
+            min_similarity, max_similarity = cosine_similarities.min(), cosine_similarities.max()
+        else:
+            min_similarity = max_similarity = 0.0
+        # Normalize similarity scores to 0-1 range for better interpretation
+        if max_similarity > 0:
+            normalized_similarities = (cosine_similarities - min_similarity) / (max_similarity - min_similarity)
+        else:
+            normalized_similarities = cosine_similarities
+
+        # Combined score: 70% similarity + 30% engagement
+        final_scores = 0.7 * normalized_similarities + 0.3 * engagement_scores
+
+        top = top_k_indices(final_scores, top_n)
+        top_rows = top if rows is None else rows[top]
+        return top_rows, cosine_similarities[top], normalized_similarities[top], final_scores[top]
+
+    def _rank_candidates(self, candidates, cosine_similarities, top_n, allowed=None, pool_size=None,
+                         similarity_range=None):
+        """
+        Same ranking as _rank(), computed from the candidates of candidate_similarities() only.
+        Influencers outside the candidates have similarity 0, so their final score is bounded by
+        0.3 * engagement and only the top_n of them in engagement order can make the cut.
+        With an allowed mask (of pool_size influencers), the ranking is over those influencers only.
+        similarity_range is as in _rank().
+        """
+        if pool_size is None:
+            pool_size = len(self)
+        if similarity_range is not None:
+            min_similarity, max_similarity = similarity_range
+        else:
+            max_similarity = cosine_similarities.max() if len(candidates) else 0.0
+            # 0 is the minimum similarity as soon as one influencer shares no term with the query
+            min_similarity = cosine_similarities.min() if 0 < len(candidates) == pool_size else 0.0
+        if max_similarity > 0:
+            normalized_similarities = (cosine_similarities - min_similarity) / (max_similarity - min_similarity)
+        else:
+            normalized_similarities = cosine_similarities
+
+        # Combined score: 70% similarity + 30% engagement
+        final_scores = 0.7 * normalized_similarities + 0.3 * self.engagement_scores[candidates]
+        best = top_k_indices(final_scores, top_n)
+
+        if len(candidates) < pool_size:
+            others = self._best_outside(candidates, top_n, allowed)
+        else:
+            others = np.empty(0, dtype=np.intp)
+
+        # Merge both shortlists in row order, so ties still break by position
+        rows = np.concatenate([candidates[best], others])
+        order = np.argsort(rows, kind='stable')
+        rows = rows[order]
+        n_others = len(others)
+        similarities = np.concatenate([cosine_similarities[best], np.zeros(n_others)])[order]
+        normalized = np.concatenate([normalized_similarities[best], np.zeros(n_others)])[order]
+        pooled_scores = np.concatenate([final_scores[best], 0.3 * self.engagement_scores[others]])[order]
+
+        top = top_k_indices(pooled_scores, top_n)
+        return rows[top], similarities[top], normalized[top], pooled_scores[top]
+
+    def _best_outside(self, candidates, top_n, allowed=None):
+        """
+        The top_n highest-engagement influencers (within the allowed mask, if given) that are not
+        in the sorted candidates array.
+        The engagement order is walked in growing blocks, so this stops after about top_n rows
+        unless most of the most engaged influencers are candidates.
+        """
+        found = []
+        needed = top_n
+        start = 0
+        block_size = max(2 * top_n, 64)
+        while needed > 0 and start < len(self):
+            block = self.engagement_order[start:start + block_size]
+            if allowed is not None:
+                block = block[allowed[block]]
+            if len(candidates):
+                positions = np.searchsorted(candidates, block).clip(max=len(candidates) - 1)
+                block = block[candidates[positions] != block]
+            found.append(block[:needed])
+            needed -= len(found[-1])
+            start += block_size
+            block_size *= 2
+        return np.concatenate(found) if found else np.empty(0, dtype=np.intp)
+
+    def _result_frame(self, rows, similarities, normalized_similarities, final_scores):
+        recommended_influencers = self.influencers_df.iloc[rows].copy()
+        recommended_influencers['similarity_score'] = similarities
+        recommended_influencers['normalized_similarity'] = normalized_similarities
+        recommended_influencers['engagement_score'] = self.engagement_scores[rows]
+        recommended_influencers['final_score'] = final_scores
+        return recommended_influencers
+
+
+def _pad_rows(matrix, n_rows):
+    """
+    Appends empty rows to a sparse matrix so it has n_rows rows.
+    """
+    if matrix.shape[0] == n_rows:
+        return matrix
+    return sp.vstack([matrix, sp.csr_matrix((n_rows - matrix.shape[0], matrix.shape[1]), dtype=matrix.dtype)],
+                     format='csr')
+
+
+class _PartitionPostings(NamedTuple):
+    """
+    Posting lists over a subset of the influencers; local row i is influencer row rows[i].
+    """
+    matrix: sp.csc_matrix
+    rows: np.ndarray
+
+
+def _accumulate_postings(postings, terms, weights):
+    """
+    Term-at-a-time accumulation of a query's weights over the posting lists of its terms.
+    Returns (sorted rows of postings with a non-zero score, their scores).
+    """
+    indptr = postings.indptr
+    starts = indptr[terms]
+    lengths = indptr[terms + 1] - starts
+    total = int(lengths.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.intp), np.empty(0)
+
+    # Positions of every posting of every query term, gathered without a loop over terms
+    positions = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(total)
+    contributions = postings.data[positions] * np.repeat(weights, lengths)
+    rows = postings.indices[positions]
+    if total * 8 > postings.shape[0]:
+        # Query terms common enough that one dense accumulator is cheaper than sorting the postings
+        accumulated = np.bincount(rows, weights=contributions, minlength=postings.shape[0])
+        candidates = np.flatnonzero(accumulated)
+        return candidates, accumulated[candidates]
+    candidates, inverse = np.unique(rows, return_inverse=True)
+    similarities = np.bincount(inverse, weights=contributions, minlength=len(candidates))
+    return candidates.astype(np.intp, copy=False), similarities
+
+
+def _pad_mask(mask, n_rows):
+    """
+    Extends a boolean row mask with False up to n_rows; None becomes an all-False mask.
+    """
+    padded = np.zeros(n_rows, dtype=bool)
+    if mask is not None:
+        padded[:len(mask)] = mask
+    return padded
+
+
+def _row_scatter_matrix(row_ids, n_rows):
+    """
+    Sparse (n_rows x len(row_ids)) matrix that places row i of a block at row row_ids[i].
+    """
+    return sp.csr_matrix((np.ones(len(row_ids)), (row_ids, np.arange(len(row_ids)))),
+                         shape=(n_rows, len(row_ids)))
+
+
+def top_k_indices(scores, k):
+    """
+    Indices of the k highest scores, best first, using argpartition instead of a full sort.
+    Ties are broken by position so the same scores always produce the same ranking.
+    """
+    k = max(0, min(k, len(scores)))
+    if k == 0:
+        return np.empty(0, dtype=np.intp)
+    if k < len(scores):
+        kth_score = scores[np.argpartition(-scores, k - 1)[k - 1]]
+        candidates = np.flatnonzero(scores >= kth_score)
+    else:
+        candidates = np.arange(len(scores))
+    order = np.lexsort((candidates, -scores[candidates]))
+    return candidates[order[:k]]
+
+
+def load_or_build_index(data_file_path=DEFAULT_DATA_FILE_PATH, index_file_path=DEFAULT_INDEX_FILE_PATH,
+                        lsa_components=0, lsa_quantize=False, rebuild=False):
+    """
+    Loads the prebuilt index when it matches the data file, otherwise builds it from the data file.
+    rebuild=True skips the prebuilt index, e.g. to refit the vocabulary and IDF of an index that
+    ingestion has been updating incrementally. With lsa_components, LSA embeddings are fitted when the index does not have them yet.
+    Whatever was (re)built is saved to index_file_path, so other worker processes load and
+    memory-map that copy instead of each building their own.
+    """
+    index = None
+    if not rebuild and index_file_path and os.path.exists(index_file_path):
+        try:
+            index = RecommenderIndex.load(index_file_path)
+            if not index.is_fresh(data_file_path):
+                index = None
+        except Exception as e:
+            print(f"Could not load recommender index '{index_file_path}': {e}. Rebuilding from data.")
+    built = index is None
+    if built:
+        index = RecommenderIndex.from_data_file(data_file_path)
+    if lsa_components and index.lsa is None:
+        index = index.with_lsa(n_components=lsa_components, quantize=lsa_quantize)
+        built = True
+    if built and index_file_path:
+        save_shared_index(index, index_file_path)
+    return index
+
+
+def save_shared_index(index, index_file_path):
+    """
+    Saves index to index_file_path for the other workers. A failed save is only logged: this
+    process keeps serving its in-memory index and the others rebuild their own.
+    """
+    try:
+        index.save(index_file_path)
+    except Exception as e:
+        print(f"Could not save recommender index '{index_file_path}': {e}")
+
+
+if __name__ == '__main__':
+    # Offline build: python -m src.recommender_index [data_file_path] [index_file_path] [--lsa-components N]
+    parser = argparse.ArgumentParser(description="Build the recommender index from the preprocessed data.")
+    parser.add_argument('data_path', nargs='?', default=DEFAULT_DATA_FILE_PATH)
+    parser.add_argument('index_path', nargs='?', default=DEFAULT_INDEX_FILE_PATH)
+    parser.add_argument('--lsa-components', type=int, default=0,
+                        help=f"Also fit LSA embeddings with this many dimensions (e.g. {DEFAULT_LSA_COMPONENTS})")
+    parser.add_argument('--lsa-int8', action='store_true', help="Store the LSA embeddings as int8")
+    args = parser.parse_args()
+
+    built_index = RecommenderIndex.from_data_file(args.data_path)
+    if args.lsa_components:
+        built_index = built_index.with_lsa(n_components=args.lsa_components, quantize=args.lsa_int8)
+    built_index.save(args.index_path)
+    print(f"Built recommender index for {len(built_index)} influencers from '{args.data_path}' -> '{args.index_path}'")
@@ -3,6 +3,8 @@ from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
 import re  # Needed if clean_text is not imported separately
 
+from src.data_processor import load_posts
+
 def clean_text(text):
     if not isinstance(text, str):
         return ""
@@ -16,8 +18,8 @@ def clean_text(text):
 def recommend_influencers(user_business_description, data_file_path='../data/combined_preprocessed_influencer_data.csv',
                           top_n=5):
     try:
-        # Load the preprocessed data
-        df = pd.read_csv(data_file_path)
+        # Load only the columns used below from the preprocessed data (CSV or Parquet)
+        df = load_posts(data_file_path, columns=['username', 'cleaned_caption', 'cleaned_hashtags', 'likes', 'comments'])
         print(f"Loaded preprocessed data from {data_file_path}. Shape: {df.shape}")
 
         # Ensure 'cleaned_caption' and 'cleaned_hashtags' columns exist and are string type
@@ -0,0 +1,47 @@
+# src/sampling_profiler.py
+
+import cProfile
+import os
+import random
+import threading
+import time
+
+
+class SamplingProfiler:
+    """
+    Runs a random sample of calls under cProfile and keeps the profiles of the slow ones as
+    .prof files (open with `python -m pstats` or snakeviz). sample_rate=0 disables it.
+    """
+
+    def __init__(self, sample_rate=0.0, output_dir='profiles', min_duration_ms=0.0):
+        self.sample_rate = sample_rate
+        self.output_dir = output_dir
+        self.min_duration_ms = min_duration_ms
+        self.profiles_written = 0
+        self._lock = threading.Lock()
+
+    def run(self, name, fn, *args, **kwargs):
+        """
+        Calls fn(*args, **kwargs), profiling it when this call is sampled.
+        """
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return fn(*args, **kwargs)
+
+        # cProfile only sees the calling thread, so the profile covers just this request
+        profile = cProfile.Profile()
+        start = time.perf_counter()
+        profile.enable()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            profile.disable()
+            duration_ms = (time.perf_counter() - start) * 1000
+            if duration_ms >= self.min_duration_ms:
+                self._dump(profile, name, duration_ms)
+
+    def _dump(self, profile, name, duration_ms):
+        os.makedirs(self.output_dir, exist_ok=True)
+        file_name = f"{name}-{time.strftime('%Y%m%d-%H%M%S')}-{int(duration_ms)}ms-{threading.get_ident()}.prof"
+        profile.dump_stats(os.path.join(self.output_dir, file_name))
+        with self._lock:
+            self.profiles_written += 1
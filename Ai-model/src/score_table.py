@@ -0,0 +1,77 @@
+# src/score_table.py
+
+from typing import NamedTuple
+
+import pandas as pd
+
+DEFAULT_SCORES_FILE_PATH = 'data/influencer_scores.csv'
+
+
+class InfluencerScoreRecord(NamedTuple):
+    """
+    One row of influencer_scores.csv. A plain tuple keeps each record small compared to a DataFrame row.
+    """
+    username: str
+    score: float
+    avg_likes: float
+    total_likes: int
+    post_count: int
+    total_comments: int
+    avg_comments: float
+
+
+class InfluencerScoreTable:
+    """
+    Score table indexed by case-folded username for O(1) lookups, plus the records sorted best score
+    first (ties by username) and each influencer's 1-based rank in that order, so leaderboard pages
+    and rank lookups never scan the table.
+    """
+
+    def __init__(self, records):
+        self._records = {}
+        for record in records:
+            # Keep the first row when a username appears more than once, like the old iloc[0] lookup
+            self._records.setdefault(record.username.casefold(), record)
+        self._ranked = sorted(self._records.values(), key=lambda record: (-record.score, record.username))
+        self._ranks = {record.username.casefold(): rank for rank, record in enumerate(self._ranked, start=1)}
+
+    def __len__(self):
+        return len(self._records)
+
+    def __contains__(self, username):
+        return username.casefold() in self._records
+
+    @classmethod
+    def from_dataframe(cls, df):
+        columns = [df[field] for field in InfluencerScoreRecord._fields]
+        records = (
+            InfluencerScoreRecord(str(username), float(score), float(avg_likes), int(total_likes),
+                                  int(post_count), int(total_comments), float(avg_comments))
+            for username, score, avg_likes, total_likes, post_count, total_comments, avg_comments in zip(*columns)
+        )
+        return cls(records)
+
+    @classmethod
+    def from_csv(cls, scores_file_path):
+        return cls.from_dataframe(pd.read_csv(scores_file_path, usecols=list(InfluencerScoreRecord._fields)))
+
+    def get(self, username):
+        """
+        Returns the record for username (case-insensitive), or None when it is not in the table.
+        """
+        return self._records.get(username.casefold())
+
+    def get_many(self, usernames):
+        return [self.get(username) for username in usernames]
+
+    def rank(self, username):
+        """
+        1-based leaderboard position of username (case-insensitive), or None when it is not in the table.
+        """
+        return self._ranks.get(username.casefold())
+
+    def leaderboard(self, top=10, offset=0):
+        """
+        The records ranked offset + 1 to offset + top, best first.
+        """
+        return self._ranked[offset:offset + top]
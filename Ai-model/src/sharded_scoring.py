@@ -0,0 +1,353 @@
+# src/sharded_scoring.py
+#
+# Scores one index across worker processes, each owning a contiguous range of influencer rows.
+# A query takes two round trips: the shards first report the similarity range of their rows,
+# then rank their rows against the combined range and return a local top_n, which the
+# coordinator merges. Scores and ranking are the same as RecommenderIndex.recommend_many().
+
+import heapq
+import itertools
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import NamedTuple
+
+import numpy as np
+
+from src.metrics import NULL_TIMER
+from src.recommender_index import QUERY_BATCH_SIZE, RecommenderIndex
+
+# Queries between the two round trips kept per shard; older ones are dropped if never ranked
+PENDING_QUERIES_LIMIT = 64
+
+# Seconds a shard process gets to exit on its own at shutdown before it is terminated
+SHARD_SHUTDOWN_TIMEOUT = 5.0
+
+
+def shard_bounds(n_rows, n_shards):
+    """
+    Row boundaries splitting n_rows into n_shards contiguous ranges of near-equal size.
+    """
+    return np.linspace(0, n_rows, n_shards + 1).astype(int)
+
+
+def _similarity_stats(index, query_matrix, engine, filters):
+    """
+    First round trip on one shard: scores the queries against the shard's rows. Returns the state
+    kept for _rank_queries() and, per query, what the coordinator needs to normalize globally.
+    """
+    if engine == 'lsa':
+        rows = np.flatnonzero(index.filter_mask(**filters)) if filters else None
+        similarities = index.lsa.similarities(query_matrix, rows)
+        stats = [
+            (len(column), column.min(), column.max()) if len(column) else (0, None, None)
+            for column in similarities.T
+        ]
+        return (rows, similarities), stats
+
+    allowed, pool_size, postings = None, len(index), None
+    if filters:
+        allowed, pool_size, postings = index.filter_pool(filters)
+        if allowed is None:
+            pool_size = len(index)
+    scored = []
+    stats = []
+    for i in range(query_matrix.shape[0]):
+        query = query_matrix[i]
+        candidates, similarities = index.candidate_similarities(query.indices, query.data, postings, allowed)
+        scored.append((candidates, similarities))
+        if len(candidates):
+            stats.append((len(candidates), pool_size, similarities.min(), similarities.max()))
+        else:
+            stats.append((0, pool_size, None, None))
+    return (scored, allowed, pool_size), stats
+
+
+def _rank_queries(index, state, engine, top_n, similarity_ranges):
+    """
+    Second round trip on one shard: the shard's top_n per query under the global similarity ranges.
+    """
+    ranked = []
+    if engine == 'lsa':
+        rows, similarities = state
+        for i, similarity_range in enumerate(similarity_ranges):
+            ranked.append(index._rank(similarities[:, i], top_n, rows, similarity_range=similarity_range))
+        return ranked
+
+    scored, allowed, pool_size = state
+    for (candidates, similarities), similarity_range in zip(scored, similarity_ranges):
+        ranked.append(index._rank_candidates(candidates, similarities, top_n, allowed=allowed, pool_size=pool_size,
+                                             similarity_range=similarity_range))
+    return ranked
+
+
+def _serve_shard(connection, index_dir, start, stop):
+    """
+    Shard process: memory-maps the saved index, keeps rows [start, stop) and answers requests
+    from the coordinator until it receives None or the pipe closes.
+    """
+    try:
+        index = RecommenderIndex.load(index_dir, mmap=True).row_range(start, stop)
+    except Exception as e:
+        connection.send(('error', e))
+        connection.close()
+        return
+    connection.send(('ok', len(index)))
+
+    pending = OrderedDict()
+    while True:
+        try:
+            message = connection.recv()
+        except EOFError:
+            break
+        if message is None:
+            break
+
+        operation, request_id, arguments = message
+        try:
+            if operation == 'stats':
+                query_matrix, engine, filters = arguments
+                pending[request_id], result = _similarity_stats(index, query_matrix, engine, filters)
+                while len(pending) > PENDING_QUERIES_LIMIT:
+                    pending.popitem(last=False)
+            elif operation == 'rank':
+                engine, top_n, similarity_ranges = arguments
+                ranked = _rank_queries(index, pending.pop(request_id), engine, top_n, similarity_ranges)
+                # Local rows back to rows of the whole index
+                result = [(rows + start, *scores) for rows, *scores in ranked]
+            else:
+                raise ValueError(f"Unknown shard operation '{operation}'.")
+            connection.send(('ok', result))
+        except Exception as e:
+            connection.send(('error', e))
+    connection.close()
+
+
+def _sparse_similarity_range(shard_stats):
+    """
+    Global (min, max) similarity from the shards' (candidates, pool size, min, max) for one query.
+    """
+    maxima = [stats[3] for stats in shard_stats if stats[0]]
+    minima = [stats[2] for stats in shard_stats if stats[0]]
+    if not maxima:
+        return 0.0, 0.0
+    # 0 is the minimum similarity as soon as one influencer anywhere shares no term with the query
+    every_row_is_candidate = sum(stats[0] for stats in shard_stats) == sum(stats[1] for stats in shard_stats)
+    return (min(minima) if every_row_is_candidate else 0.0), max(maxima)
+
+
+def _lsa_similarity_range(shard_stats):
+    """
+    Global (min, max) similarity from the shards' (rows, min, max) for one query.
+    """
+    minima = [stats[1] for stats in shard_stats if stats[0]]
+    maxima = [stats[2] for stats in shard_stats if stats[0]]
+    if not maxima:
+        return 0.0, 0.0
+    return min(minima), max(maxima)
+
+
+def merge_top_n(shard_results, top_n):
+    """
+    Merges the shards' rankings of one query (each best first, ties by row) into the global top_n
+    with a heap. Returns (rows, similarities, normalized similarities, final scores).
+    """
+    streams = [
+        zip(-final_scores, rows, similarities, normalized)
+        for rows, similarities, normalized, final_scores in shard_results
+    ]
+    best = list(itertools.islice(heapq.merge(*streams), top_n))
+    if not best:
+        rows, similarities, normalized, final_scores = shard_results[0]
+        return rows[:0], similarities[:0], normalized[:0], final_scores[:0]
+    negated_scores, rows, similarities, normalized = zip(*best)
+    return np.array(rows), np.array(similarities), np.array(normalized), -np.array(negated_scores)
+
+
+class ShardUnavailable(Exception):
+    """
+    Raised when a shard process died or its pipe broke.
+    """
+
+
+class _Shard(NamedTuple):
+    process: multiprocessing.Process
+    connection: object
+    lock: threading.Lock
+
+
+class ShardedRecommender:
+    """
+    Serves recommend()/recommend_many() for an index by scoring it in n_shards worker processes.
+    The index is saved once to a private directory that every shard memory-maps, so the read-only
+    arrays are shared; each shard builds posting lists for its own rows only. Other attributes
+    (vectorizer, influencers_df, is_fresh(), with_posts(), ...) are those of the wrapped index.
+    """
+
+    def __init__(self, index, n_shards, work_dir=None):
+        self.index = index
+        self._work_dir = tempfile.mkdtemp(prefix='recommender-shards-', dir=work_dir)
+        self._request_ids = itertools.count()
+        self._state_lock = threading.Lock()
+        self._in_flight = 0
+        self._closing = False
+        self._closed = False
+        self._shards = []
+        try:
+            index_dir = os.path.join(self._work_dir, 'index')
+            index.save(index_dir)
+            self._start_shards(index_dir, max(1, min(n_shards, len(index))))
+        except Exception:
+            self._closed = True
+            self._shutdown()
+            raise
+
+    def _start_shards(self, index_dir, n_shards):
+        # spawn, not fork: the API process runs threads, which fork does not carry over safely
+        context = multiprocessing.get_context('spawn')
+        bounds = shard_bounds(len(self.index), n_shards)
+        for shard_id, (start, stop) in enumerate(zip(bounds[:-1], bounds[1:])):
+            connection, child_connection = context.Pipe()
+            process = context.Process(target=_serve_shard, args=(child_connection, index_dir, int(start), int(stop)),
+                                      name=f'recommender-shard-{shard_id}', daemon=True)
+            process.start()
+            child_connection.close()
+            self._shards.append(_Shard(process, connection, threading.Lock()))
+        for shard in self._shards:
+            try:
+                self._receive(shard)
+            except EOFError:
+                raise ShardUnavailable(f"Shard process {shard.process.name} exited during start-up "
+                                       f"(exit code {shard.process.exitcode}).") from None
+
+    def __len__(self):
+        return len(self.index)
+
+    def __getattr__(self, name):
+        if name == 'index':
+            raise AttributeError(name)
+        return getattr(self.index, name)
+
+    @property
+    def n_shards(self):
+        return len(self._shards)
+
+    def recommend(self, expanded_description, top_n=5, filters=None, engine='sparse', timer=NULL_TIMER):
+        return self.recommend_many([expanded_description], top_n=top_n, filters=filters, engine=engine,
+                                   timer=timer)[0]
+
+    def recommend_many(self, expanded_descriptions, top_n=5, filters=None, engine='sparse', timer=NULL_TIMER):
+        """
+        Same results as RecommenderIndex.recommend_many(), scored by the shards. The 'similarity'
+        stage is the first round trip, 'top_k' the second one plus the merge.
+        """
+        self.index.check_engine(engine)
+        if top_n is None:
+            top_n = len(self.index)
+        with self._state_lock:
+            if self._closed:
+                # A request that still holds a replaced snapshot finishes in-process
+                return self.index.recommend_many(expanded_descriptions, top_n=top_n, filters=filters,
+                                                 engine=engine, timer=timer)
+            self._in_flight += 1
+        try:
+            results = []
+            for start in range(0, len(expanded_descriptions), QUERY_BATCH_SIZE):
+                with timer.stage('vectorize'):
+                    query_matrix = self.index.vectorizer.transform(expanded_descriptions[start:start + QUERY_BATCH_SIZE])
+                results.extend(self._score(query_matrix, top_n, filters or {}, engine, timer))
+            return results
+        except ShardUnavailable as e:
+            # Stop using the shards for good and serve this and later requests in-process
+            print(f"Sharded scoring failed, scoring in-process from now on: {e}")
+            with self._state_lock:
+                shutdown = not self._closed
+                self._closed = True
+            if shutdown:
+                self._shutdown()
+            return self.index.recommend_many(expanded_descriptions, top_n=top_n, filters=filters,
+                                             engine=engine, timer=timer)
+        finally:
+            with self._state_lock:
+                self._in_flight -= 1
+                shutdown = self._closing and self._in_flight == 0 and not self._closed
+                self._closed = self._closed or shutdown
+            if shutdown:
+                self._shutdown()
+
+    def _score(self, query_matrix, top_n, filters, engine, timer):
+        request_id = next(self._request_ids)
+        with timer.stage('similarity'):
+            shard_stats = self._exchange(('stats', request_id, (query_matrix, engine, filters)))
+
+        similarity_range = _lsa_similarity_range if engine == 'lsa' else _sparse_similarity_range
+        similarity_ranges = [similarity_range([stats[i] for stats in shard_stats])
+                             for i in range(query_matrix.shape[0])]
+        with timer.stage('top_k'):
+            shard_rankings = self._exchange(('rank', request_id, (engine, top_n, similarity_ranges)))
+            merged = [merge_top_n([ranking[i] for ranking in shard_rankings], top_n)
+                      for i in range(query_matrix.shape[0])]
+
+        results = []
+        with timer.stage('result_frame'):
+            for ranked in merged:
+                results.append(self.index._result_frame(*ranked))
+        return results
+
+    def _exchange(self, message):
+        """
+        Sends message to every shard, then collects their replies in shard order. All shard locks
+        are taken in the same order, so concurrent requests never see each other's replies.
+        Raises ShardUnavailable when a pipe is broken; the shards must not be used after that,
+        since the pipes that did receive the message are left with unread replies.
+        """
+        for shard in self._shards:
+            shard.lock.acquire()
+        try:
+            for shard in self._shards:
+                shard.connection.send(message)
+            # Read every reply before raising, so no pipe is left with an unread message
+            replies = [shard.connection.recv() for shard in self._shards]
+        except (OSError, EOFError) as e:
+            raise ShardUnavailable(f"{type(e).__name__}: {e}") from e
+        finally:
+            for shard in reversed(self._shards):
+                shard.lock.release()
+        for status, result in replies:
+            if status == 'error':
+                raise result
+        return [result for _, result in replies]
+
+    @staticmethod
+    def _receive(shard):
+        status, result = shard.connection.recv()
+        if status == 'error':
+            raise result
+        return result
+
+    def close(self):
+        """
+        Stops the shard processes once the requests currently using them have finished.
+        """
+        with self._state_lock:
+            self._closing = True
+            idle = self._in_flight == 0 and not self._closed
+            self._closed = self._closed or idle
+        if idle:
+            self._shutdown()
+
+    def _shutdown(self):
+        for shard in self._shards:
+            with shard.lock:
+                try:
+                    shard.connection.send(None)
+                except (OSError, ValueError):
+                    pass
+            shard.process.join(SHARD_SHUTDOWN_TIMEOUT)
+            if shard.process.is_alive():
+                shard.process.terminate()
+            shard.connection.close()
+        shutil.rmtree(self._work_dir, ignore_errors=True)
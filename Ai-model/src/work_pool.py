@@ -0,0 +1,66 @@
+# src/work_pool.py
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class WorkPoolSaturated(Exception):
+    """
+    Raised when the pool already has as many running and queued jobs as it accepts.
+    """
+
+
+class BoundedWorkPool:
+    """
+    Thread pool for CPU-bound recommendation work so it never runs on the asyncio event loop.
+    At most max_workers jobs run at once and at most max_queue more wait for a worker; anything
+    beyond that is rejected immediately with WorkPoolSaturated instead of piling up.
+    """
+
+    def __init__(self, max_workers=4, max_queue=32):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='recommender')
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._in_flight = 0
+        self._rejected = 0
+        self._counter_lock = threading.Lock()
+
+    def _release(self, _future=None):
+        with self._counter_lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    async def run(self, fn, *args, **kwargs):
+        """
+        Runs fn(*args, **kwargs) on a worker thread and awaits its result.
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._counter_lock:
+                self._rejected += 1
+            raise WorkPoolSaturated(
+                f"Recommendation queue is full ({self.max_workers} running, {self.max_queue} queued)"
+            )
+
+        with self._counter_lock:
+            self._in_flight += 1
+        try:
+            future = self._executor.submit(fn, *args, **kwargs)
+        except Exception:
+            self._release()
+            raise
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def stats(self):
+        with self._counter_lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "in_flight": self._in_flight,
+                "rejected": self._rejected,
+            }
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)